@@ -1,14 +1,20 @@
 import pygame
 import os
-import time
+import struct
+from PyQt5.QtCore import QTimer, Qt
 from mutagen.mp3 import MP3
 from mutagen.wavpack import WavPack
 from mutagen.flac import FLAC
+from audio_probe import probe_wav
+from mp3_index import Mp3FrameIndex, Mp3IndexCache, OffsetFile, probe_mp3
+from playback_clock import PlaybackClock
+from stream_player import StreamPlayer
 
 
 class AudioHandler:
-    def __init__(self):
+    def __init__(self, memory_cache=None, pcm_cache_bytes=128 * 1024 * 1024):
         pygame.mixer.init()
+        self.memory_cache = memory_cache  # 进程内LRU缓存（MediaCache，可选），保存音频时长等信息
         self.current_audio_path = ""  # 当前音频路径
         self.total_duration = 0  # 音频总时长（秒）
         self.is_playing = False  # 播放状态
@@ -16,44 +22,179 @@ class AudioHandler:
         self.playback_speed = 1.0  # 播放倍速
         self.original_freq = 44100  # 原始采样率
         self._paused_at = 0  # 暂停时的位置（秒）
-        self._play_start_time = 0  # 开始播放的时间戳
+        self.clock = PlaybackClock()  # 播放时钟（按实际输出的采样计算位置）
         self._play_start_position = 0  # 开始播放的位置
-
-    # 加载音频文件
+        # 流式播放器（变速不变调）；缺少 numpy/soundfile 或文件无法解码时使用 pygame.mixer.music
+        self.stream_player = StreamPlayer(self.clock, pcm_cache_bytes) if StreamPlayer.is_available() else None
+        self._use_stream = False  # 当前音频是否使用流式播放
+        self._prepared_stream = False  # 后台加载时选择的播放方式
+        # MP3帧索引（pygame 播放MP3时用于按帧精确跳转），持久化保存在缓存目录中
+        self.mp3_index_cache = Mp3IndexCache(os.path.join("cache", "mp3_index"))
+        self.mp3_index = None
+        self._prepared_index = None
+        self._prepared_speed = 1.0  # 后台加载时混音器对应的倍速（pygame 播放）
+        # A-B循环：(start_sec, end_sec, repeats)，repeats 为总播放次数，None 表示无限循环
+        self.loop_range = None
+        self._loop_left = None  # pygame 播放时剩余的循环次数
+        # pygame 播放时到达循环终点的单次定时器（在主线程触发，与暂停、跳转等操作不会交错执行）
+        self._loop_timer = QTimer()
+        self._loop_timer.setSingleShot(True)
+        self._loop_timer.setTimerType(Qt.PreciseTimer)
+        self._loop_timer.timeout.connect(self._on_loop_end)
+        self._loop_finished = False  # pygame 播放时最后一遍是否已结束
+
+    # 加载音频文件（同步加载；界面中使用 AsyncAudioLoader 在后台线程加载）
     def load_audio(self, audio_path):
         if not os.path.exists(audio_path):
             return False, "音频文件不存在"
 
-        # 停止当前播放并重置状态
+        self.begin_load()
+        success, msg, duration = self.prepare_audio(audio_path)
+        if success:
+            self.finish_load(audio_path, duration)
+        return success, msg
+
+    # 开始加载：停止当前播放并重置状态（加载完成前不能播放或跳转）
+    def begin_load(self):
         self.stop_audio()
-        self.current_audio_path = audio_path
-        self.total_duration = self.get_audio_duration(audio_path)
+        self.clear_loop()
+        self.current_audio_path = ""
+        self.total_duration = 0
+        self.mp3_index = None
 
+    # 读取音频时长并载入混音器（耗时操作，可在后台线程执行）
+    def prepare_audio(self, audio_path):
+        if not os.path.exists(audio_path):
+            return False, "音频文件不存在", 0
+
+        duration = self.get_audio_duration(audio_path)
+        self._prepared_index = None
+        if self.stream_player is not None:
+            try:
+                stream_duration = self.stream_player.open(audio_path)
+                self._prepared_stream = True
+                return True, "加载成功", duration or stream_duration
+            except Exception as e:
+                print(f"无法流式解码，改用 pygame 播放: {e}")
+
+        self._prepared_stream = False
+        self._prepared_speed = self.playback_speed
         try:
+            # pygame 播放时倍速由混音器频率决定：按当前倍速初始化混音器后载入
+            self._reinit_mixer(int(self.original_freq * self._prepared_speed))
             pygame.mixer.music.load(audio_path)
-            # 重置进度
-            self.current_progress = 0
-            self._paused_at = 0
-            return True, "加载成功"
         except Exception as e:
-            return False, f"加载失败: {str(e)}"
+            return False, f"加载失败: {str(e)}", duration
+
+        if os.path.splitext(audio_path)[1].lower() == ".mp3":
+            index = self.get_mp3_index(audio_path)
+            if index is not None and index.offsets:
+                self._prepared_index = index
+                duration = index.duration  # 按实际帧数计算的时长
+        return True, "加载成功", duration
+
+    # 加载完成：记录当前音频并重置进度
+    def finish_load(self, audio_path, duration):
+        self.current_audio_path = audio_path
+        self.total_duration = duration
+        self.current_progress = 0
+        self._paused_at = 0
+        self._use_stream = self._prepared_stream
+        self.mp3_index = self._prepared_index
+        if self._use_stream:
+            self.stream_player.set_speed(self.playback_speed)
+        elif self.playback_speed != self._prepared_speed:
+            # 加载期间调整了倍速：按新的倍速重新初始化混音器
+            self.set_playback_speed(self.playback_speed)
+
+    # 重新初始化混音器（有流式播放器时由播放器在锁内进行）
+    def _reinit_mixer(self, frequency):
+        if self.stream_player is not None:
+            self.stream_player.reinit_mixer(frequency)
+        elif pygame.mixer.get_init()[0] != frequency:
+            pygame.mixer.quit()
+            pygame.mixer.init(frequency=frequency)
 
     # 获取音频总时长
     def get_audio_duration(self, audio_path):
+        return self.get_audio_info(audio_path)["duration"]
+
+    # 获取音频信息（时长、采样率、声道数、码率），优先使用内存缓存
+    def get_audio_info(self, audio_path):
+        stamp = None
+        if self.memory_cache is not None:
+            try:
+                stamp = self.memory_cache.file_stamp(audio_path)
+            except OSError:
+                return self.read_audio_info(audio_path)
+            cached = self.memory_cache.get("audio", audio_path, stamp)
+            if cached is not None:
+                return cached
+
+        info = self.read_audio_info(audio_path)
+        if self.memory_cache is not None and info["duration"] > 0:
+            self.memory_cache.put("audio", audio_path, stamp, info, 512)
+        return info
+
+    # 获取MP3帧索引：依次查找内存缓存、磁盘缓存，都没有时扫描文件建立索引
+    def get_mp3_index(self, audio_path):
+        try:
+            stat = os.stat(audio_path)
+        except OSError:
+            return None
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        if self.memory_cache is not None:
+            index = self.memory_cache.get("mp3_index", audio_path, stamp)
+            if index is not None:
+                return index
+
+        index = self.mp3_index_cache.get(audio_path, stat)
+        if index is None:
+            try:
+                index = Mp3FrameIndex.build(audio_path)
+            except (OSError, ValueError) as e:
+                print(f"建立MP3帧索引错误: {e}")
+                return None
+            self.mp3_index_cache.put(audio_path, stat, index)
+        if self.memory_cache is not None:
+            self.memory_cache.put("mp3_index", audio_path, stamp, index, index.offsets.itemsize * len(index.offsets))
+        return index
+
+    # 从文件读取音频信息
+    @staticmethod
+    def read_audio_info(audio_path):
+        info = {"duration": 0, "sample_rate": 0, "channels": 0, "bitrate": 0}
         ext = os.path.splitext(audio_path)[1].lower()
         try:
+            if ext == ".wav":
+                try:
+                    return probe_wav(audio_path)
+                except (OSError, ValueError, struct.error) as e:
+                    # 文件头无法识别时才整体解码获取时长
+                    print(f"读取WAV文件头失败，改为解码获取时长: {e}")
+                    info["duration"] = pygame.mixer.Sound(audio_path).get_length()
+                    return info
+
             if ext == ".mp3":
-                return MP3(audio_path).info.length
-            elif ext == ".wav":
-                return pygame.mixer.Sound(audio_path).get_length()
+                try:
+                    return probe_mp3(audio_path)
+                except (OSError, ValueError, struct.error) as e:
+                    print(f"读取MP3帧头失败，改用 mutagen: {e}")
+                stream_info = MP3(audio_path).info
             elif ext == ".flac":
-                return FLAC(audio_path).info.length
+                stream_info = FLAC(audio_path).info
             elif ext == ".wv":
-                return WavPack(audio_path).info.length
-            return 0
+                stream_info = WavPack(audio_path).info
+            else:
+                return info
+            info["duration"] = stream_info.length
+            info["sample_rate"] = getattr(stream_info, "sample_rate", 0)
+            info["channels"] = getattr(stream_info, "channels", 0)
+            info["bitrate"] = getattr(stream_info, "bitrate", 0)
+            return info
         except Exception as e:
             print(f"获取时长错误: {e}")
-            return 0
+            return info
 
     # 播放/暂停切换（修复版）
     def play_pause(self):
@@ -64,31 +205,27 @@ class AudioHandler:
             # 暂停逻辑：记录当前位置
             self._update_current_progress()
             self._paused_at = self.current_progress
-            pygame.mixer.music.pause()
+            self._pause_output(self.current_progress)
             self.is_playing = False
         else:
             # 播放逻辑：从当前位置开始
             start_position = self._paused_at if self._paused_at > 0 else self.current_progress
-
-            # 设置播放位置
-            pygame.mixer.music.play(start=start_position)
-
-            # 记录开始播放的时间和位置
-            self._play_start_time = time.time()
-            self._play_start_position = start_position
-
+            self._start_output(start_position)
             self.is_playing = True
 
         return True, ""
 
     # 停止音频（重置所有状态）
     def stop_audio(self):
+        self._cancel_loop_timer()
         pygame.mixer.music.stop()
+        if self.stream_player is not None:
+            self.stream_player.stop()
         self.is_playing = False
         self.current_progress = 0
         self._paused_at = 0
-        self._play_start_time = 0
         self._play_start_position = 0
+        self.clock.pause(0)
 
     # 快进/后退（精确控制）
     def fast_seek(self, sec, is_forward=True):
@@ -103,31 +240,27 @@ class AudioHandler:
         new_progress = current_pos + sec if is_forward else current_pos - sec
         new_progress = max(0, min(new_progress, self.total_duration))
 
-        # 更新状态
+        # 更新状态并从新位置继续
         self.current_progress = new_progress
         self._paused_at = new_progress
-
-        # 重新从新位置播放
-        was_playing = self.is_playing
-        pygame.mixer.music.stop()
-        pygame.mixer.music.play(start=new_progress)
-
-        if was_playing:
-            # 更新播放开始时间和位置
-            self._play_start_time = time.time()
-            self._play_start_position = new_progress
-            self.is_playing = True
-        else:
-            self.is_playing = False
-            pygame.mixer.music.pause()
+        self._seek_output(new_progress)
 
         return True, ""
 
     # 设置播放倍速（修复版）
     def set_playback_speed(self, speed):
+        # 流式播放：变速不变调，从下一个输出块开始生效，不需要重新初始化混音器
+        if self._use_stream or (not self.current_audio_path and self.stream_player is not None):
+            self.playback_speed = speed
+            self.stream_player.set_speed(speed)
+            return
+
         if not self.current_audio_path:
+            # 加载中（或未加载音频）：只记录倍速，加载完成时由 finish_load 应用
+            self.playback_speed = speed
             return
 
+        # 以下为 pygame.mixer.music 播放时的做法（通过改变混音器频率变速，音调也会改变）
         # 保存当前播放状态和位置
         was_playing = self.is_playing
         self._update_current_progress()
@@ -136,37 +269,49 @@ class AudioHandler:
         pygame.mixer.music.stop()
 
         # 重新初始化混音器（调整频率）
-        pygame.mixer.quit()
-        new_freq = int(self.original_freq * speed)
-        pygame.mixer.init(frequency=new_freq)
+        self._reinit_mixer(int(self.original_freq * speed))
 
         # 重新加载音频
-        pygame.mixer.music.load(self.current_audio_path)
+        if self.mp3_index is None:
+            pygame.mixer.music.load(self.current_audio_path)
 
         # 从当前位置播放
-        start_position = self.current_progress
-        pygame.mixer.music.play(start=start_position)
+        start_position = self._play_music(self.current_progress)
+
+        self.playback_speed = speed
 
         # 恢复之前的播放状态
         if was_playing:
-            self._play_start_time = time.time()
             self._play_start_position = start_position
+            self.clock.start(start_position, speed)
+            self._schedule_loop_timer(start_position)
             self.is_playing = True
         else:
             pygame.mixer.music.pause()
+            self.clock.pause(start_position)
             self.is_playing = False
 
-        self.playback_speed = speed
-
     # 更新当前进度（内部方法）
     def _update_current_progress(self):
         if self.is_playing:
-            # 计算从开始播放到现在的时间
-            elapsed = time.time() - self._play_start_time
-            # 当前进度 = 开始位置 + 经过的时间
-            self.current_progress = self._play_start_position + elapsed
+            if self._use_stream:
+                # 流式播放时，播放器在每个输出块开始播放时校准时钟
+                finished = self.stream_player.finished
+                loop_finished = self.stream_player.loop_finished
+            else:
+                # get_pos 为 play() 之后混音器实际输出的毫秒数，乘以倍速换算为媒体时间
+                finished = False
+                loop_finished = self._loop_finished
+                output_ms = pygame.mixer.music.get_pos()
+                if output_ms >= 0:
+                    self.clock.sync(self._play_start_position + output_ms / 1000 * self.playback_speed)
+            # 当前进度 = 最近确认的位置 + 按单调时钟插值的时间
+            self.current_progress = self.clock.position()
+            if loop_finished:
+                # 循环的最后一遍已结束：停在循环终点
+                self._finish_loop()
             # 确保不超过总时长
-            if self.current_progress > self.total_duration:
+            elif finished or self.current_progress > self.total_duration:
                 self.current_progress = self.total_duration
                 self.stop_audio()
         # 暂停时使用保存的进度
@@ -176,6 +321,10 @@ class AudioHandler:
         self._update_current_progress()
         return self.current_progress
 
+    # 获取播放时钟的漂移统计
+    def get_clock_stats(self):
+        return self.clock.get_stats()
+
     # 直接跳转到指定位置
     def seek_to(self, position_sec):
         if not self.current_audio_path:
@@ -186,17 +335,129 @@ class AudioHandler:
         # 更新状态
         self.current_progress = position_sec
         self._paused_at = position_sec
+        self._seek_output(position_sec)
 
-        was_playing = self.is_playing
-        pygame.mixer.music.stop()
-        pygame.mixer.music.play(start=position_sec)
+        return True, ""
 
-        if was_playing:
-            self._play_start_time = time.time()
-            self._play_start_position = position_sec
-            self.is_playing = True
+    # 从指定位置开始输出
+    def _start_output(self, position):
+        if self._use_stream:
+            self.stream_player.play(position)
+        else:
+            position = self._play_music(position)
+            self._play_start_position = position
+            self.clock.start(position, self.playback_speed)
+            self._loop_left = None if self.loop_range is None or self.loop_range[2] is None else self.loop_range[2] - 1
+            self._loop_finished = False
+            self._schedule_loop_timer(position)
+
+    # pygame 播放：MP3有帧索引时从目标帧的字节位置重新载入，否则用 play(start=...) 跳转
+    # 返回实际开始播放的位置（目标帧的开始时间）
+    def _play_music(self, position):
+        if self.mp3_index is None:
+            pygame.mixer.music.play(start=position)
+            return position
+        offset, frame_start = self.mp3_index.locate(position)
+        pygame.mixer.music.load(OffsetFile(self.current_audio_path, offset), "mp3")
+        pygame.mixer.music.play()
+        return frame_start
+
+    # 暂停输出（下次播放时从记录的位置重新开始）
+    def _pause_output(self, position):
+        self._cancel_loop_timer()
+        if self._use_stream:
+            self.stream_player.stop()
         else:
             pygame.mixer.music.pause()
-            self.is_playing = False
+        self.clock.pause(position)
 
-        return True, ""
\ No newline at end of file
+    # 跳转：播放中从新位置继续，暂停时只记录位置
+    def _seek_output(self, position):
+        if self.is_playing:
+            if not self._use_stream:
+                pygame.mixer.music.stop()
+            self._start_output(position)
+        else:
+            self._pause_output(position)
+
+    # 设置A-B循环：从循环区间内开始播放后，到达终点时回到起点，共播放 repeats 遍（None 为无限循环）
+    # 流式播放时在采样级别衔接，最后一遍恰好停在终点；pygame 播放时由定时器按倍速换算的时间跳转
+    def set_loop(self, start_sec, end_sec, repeats=None):
+        if not self.current_audio_path:
+            return False, "未加载音频"
+        end_sec = min(end_sec, self.total_duration)
+        if end_sec <= start_sec:
+            return False, "循环区间无效"
+
+        self.loop_range = (start_sec, end_sec, repeats)
+        self._loop_finished = False
+        if self._use_stream:
+            self.stream_player.set_loop(start_sec, end_sec, repeats)
+        else:
+            self._loop_left = None if repeats is None else repeats - 1
+            if self.is_playing:
+                self._update_current_progress()
+                self._schedule_loop_timer(self.current_progress)
+        return True, ""
+
+    # 取消A-B循环（继续正常播放）
+    def clear_loop(self):
+        self.loop_range = None
+        self._loop_finished = False
+        self._cancel_loop_timer()
+        if self.stream_player is not None:
+            self.stream_player.clear_loop()
+
+    # 循环的最后一遍结束：取消循环并暂停在终点
+    def _finish_loop(self):
+        end_sec = self.loop_range[1] if self.loop_range is not None else self.current_progress
+        self.clear_loop()
+        self.is_playing = False
+        self.current_progress = end_sec
+        self._paused_at = end_sec
+        self._pause_output(end_sec)
+
+    # pygame 播放时安排到达循环终点的定时器（不依赖界面刷新）
+    def _schedule_loop_timer(self, position):
+        self._cancel_loop_timer()
+        if self.loop_range is None or position >= self.loop_range[1]:
+            return
+        delay = (self.loop_range[1] - position) / self.playback_speed
+        self._loop_timer.start(round(delay * 1000))
+
+    def _cancel_loop_timer(self):
+        self._loop_timer.stop()
+
+    # 到达循环终点后回到起点，次数用完时暂停
+    def _on_loop_end(self):
+        loop_range = self.loop_range
+        if loop_range is None or not self.is_playing or self._use_stream:
+            return
+        start_sec, end_sec, _ = loop_range
+        if self._loop_left == 0:
+            pygame.mixer.music.pause()
+            self.clock.pause(end_sec)
+            self._loop_finished = True
+            return
+        if self._loop_left is not None:
+            self._loop_left -= 1
+        position = self._play_music(start_sec)
+        self._play_start_position = position
+        self.clock.start(position, self.playback_speed)
+        self._schedule_loop_timer(position)
+
+    # 设置需要预先解码的时间范围（标记片段），跳转到这些位置时可立即开始播放
+    def set_prefetch_ranges(self, ranges):
+        if self._use_stream:
+            self.stream_player.set_prefetch_ranges(ranges)
+
+    # 追加一个需要预先解码的时间范围（新添加的标记片段）
+    def add_prefetch_range(self, start_sec, end_sec):
+        if self._use_stream:
+            self.stream_player.add_prefetch_ranges([(start_sec, end_sec)])
+
+    # 释放播放资源（退出程序前调用）
+    def shutdown(self):
+        self._cancel_loop_timer()
+        if self.stream_player is not None:
+            self.stream_player.close()
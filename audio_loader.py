@@ -0,0 +1,84 @@
+import os
+import time
+from PyQt5.QtCore import QObject, QThread, pyqtSignal, pyqtSlot
+
+
+# 后台加载线程中的工作对象：读取音频信息并载入混音器
+class _AudioLoadWorker(QObject):
+    # 信号：请求编号、音频路径、是否成功、提示信息、音频时长
+    finished = pyqtSignal(int, str, bool, str, float)
+
+    def __init__(self, loader):
+        super().__init__()
+        self.loader = loader
+
+    @pyqtSlot(int, str)
+    def load(self, request_id, audio_path):
+        # 排队期间用户又选择了其他文件，直接跳过
+        if request_id != self.loader.latest_request_id:
+            self.finished.emit(request_id, audio_path, False, "已取消", 0.0)
+            return
+        try:
+            success, msg, duration = self.loader.audio_handler.prepare_audio(audio_path)
+        except Exception as e:
+            success, msg, duration = False, f"加载失败: {str(e)}", 0
+        self.finished.emit(request_id, audio_path, success, msg, float(duration))
+
+
+# 异步音频加载：在独立线程中执行耗时的读取和载入，避免双击音频时界面卡住
+# 加载请求按顺序执行，新请求会使之前未完成的请求失效（结果被丢弃）
+class AsyncAudioLoader(QObject):
+    load_requested = pyqtSignal(int, str)  # 发送给后台线程的加载请求
+    # 信号：请求编号、音频路径、是否成功、提示信息、加载耗时（秒）
+    audio_loaded = pyqtSignal(int, str, bool, str, float)
+    # 信号：被取消的请求编号、音频路径
+    load_cancelled = pyqtSignal(int, str)
+
+    def __init__(self, audio_handler):
+        super().__init__()
+        self.audio_handler = audio_handler
+        self.latest_request_id = 0  # 最新一次请求的编号
+        self._request_times = {}  # 请求编号 -> 发起时间
+        self.load_latencies = {}  # 音频路径 -> 最近一次加载耗时（秒）
+
+        self._thread = QThread()
+        self._worker = _AudioLoadWorker(self)
+        self._worker.moveToThread(self._thread)
+        self.load_requested.connect(self._worker.load)
+        self._worker.finished.connect(self._on_worker_finished)
+        self._thread.start()
+
+    # 发起加载请求，返回请求编号
+    def load(self, audio_path):
+        self.latest_request_id += 1
+        request_id = self.latest_request_id
+        self._request_times[request_id] = time.perf_counter()
+        # 立即停止当前播放，加载完成前播放控制不可用
+        self.audio_handler.begin_load()
+        self.load_requested.emit(request_id, audio_path)
+        return request_id
+
+    # 取消尚未完成的加载请求
+    def cancel(self):
+        self.latest_request_id += 1
+
+    # 后台加载完成（在主线程中执行）
+    def _on_worker_finished(self, request_id, audio_path, success, msg, duration):
+        start_time = self._request_times.pop(request_id, None)
+        if request_id != self.latest_request_id:
+            self.load_cancelled.emit(request_id, audio_path)
+            return
+
+        elapsed = time.perf_counter() - start_time if start_time is not None else 0.0
+        self.load_latencies[audio_path] = elapsed
+        print(f"音频加载耗时: {os.path.basename(audio_path)} {elapsed * 1000:.1f} ms")
+
+        if success:
+            self.audio_handler.finish_load(audio_path, duration)
+        self.audio_loaded.emit(request_id, audio_path, success, msg, elapsed)
+
+    # 停止后台线程（退出程序前调用）
+    def shutdown(self):
+        self.cancel()
+        self._thread.quit()
+        self._thread.wait()
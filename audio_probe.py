@@ -0,0 +1,90 @@
+import os
+import struct
+
+
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+# 读取WAV文件头获取音频信息（只读取RIFF块头，不解码音频数据）
+# 支持 RIFF / RF64（ds64块给出64位数据长度）以及 WAVE_FORMAT_EXTENSIBLE
+def probe_wav(audio_path):
+    with open(audio_path, "rb") as f:
+        file_size = os.fstat(f.fileno()).st_size
+        riff_id, _, wave_id = struct.unpack("<4sI4s", _read_exact(f, 12))
+        if riff_id not in (b"RIFF", b"RF64", b"BW64") or wave_id != b"WAVE":
+            raise ValueError("不是有效的WAV文件")
+
+        audio_format = channels = sample_rate = byte_rate = block_align = 0
+        has_fmt = False
+        data_size = None
+        fact_samples = None
+        ds64_data_size = None
+        ds64_samples = None
+
+        while data_size is None or not has_fmt:
+            chunk_header = f.read(8)
+            if len(chunk_header) < 8:
+                break
+            chunk_id, chunk_size = struct.unpack("<4sI", chunk_header)
+            padded_size = chunk_size + (chunk_size & 1)  # 块按偶数字节对齐
+
+            if chunk_id == b"ds64":
+                body = _read_exact(f, chunk_size)
+                # riffSize, dataSize, sampleCount（均为64位）
+                _, ds64_data_size, ds64_samples = struct.unpack_from("<QQQ", body)
+                f.seek(padded_size - chunk_size, 1)
+            elif chunk_id == b"fmt ":
+                body = _read_exact(f, chunk_size)
+                audio_format, channels, sample_rate, byte_rate, block_align = struct.unpack_from("<HHIIH", body)
+                if audio_format == WAVE_FORMAT_EXTENSIBLE and chunk_size >= 40:
+                    # 真实格式为子格式GUID的前两个字节
+                    audio_format = struct.unpack_from("<H", body, 24)[0]
+                has_fmt = True
+                f.seek(padded_size - chunk_size, 1)
+            elif chunk_id == b"fact":
+                body = _read_exact(f, chunk_size)
+                fact_samples = struct.unpack_from("<I", body)[0]
+                f.seek(padded_size - chunk_size, 1)
+            elif chunk_id == b"data":
+                data_start = f.tell()
+                if chunk_size == 0xFFFFFFFF and ds64_data_size is not None:
+                    data_size = ds64_data_size
+                else:
+                    data_size = chunk_size
+                # 录音中断等情况下长度字段可能不可靠，以实际文件大小为上限
+                data_size = min(data_size, file_size - data_start)
+                if has_fmt:
+                    break
+                f.seek(data_start + data_size + (data_size & 1))
+            else:
+                f.seek(padded_size, 1)
+
+    if not has_fmt or data_size is None or sample_rate <= 0:
+        raise ValueError("WAV文件缺少fmt或data块")
+
+    if audio_format in (WAVE_FORMAT_PCM, WAVE_FORMAT_IEEE_FLOAT) and block_align > 0:
+        duration = (data_size // block_align) / sample_rate
+    elif ds64_samples or fact_samples:
+        # 压缩格式：fact块（RF64为ds64块）记录了采样帧数
+        duration = (ds64_samples or fact_samples) / sample_rate
+    elif byte_rate > 0:
+        duration = data_size / byte_rate
+    else:
+        raise ValueError("无法计算WAV时长")
+
+    return {
+        "duration": duration,
+        "sample_rate": sample_rate,
+        "channels": channels,
+        "bitrate": byte_rate * 8
+    }
+
+
+# 读取指定字节数，文件提前结束时抛出异常
+def _read_exact(f, size):
+    data = f.read(size)
+    if len(data) < size:
+        raise ValueError("文件头不完整")
+    return data
@@ -0,0 +1,114 @@
+import os
+import csv
+import sys
+import time
+import tempfile
+
+# 无界面环境下也能运行
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5.QtWidgets import QApplication
+
+
+# 生成测试字幕：[(start_sec, end_sec, text), ...]
+def make_cues(count):
+    return [(i * 2.0, i * 2.0 + 1.5, f"Sentence {i}: the quick brown fox jumps over the lazy dog.")
+            for i in range(count)]
+
+
+# 字幕高亮每次切换的耗时：在不同的 current_index 附近连续切换
+# 「定位」为滚动到当前句子的耗时，应与 current_index 无关；
+# 「整次」还包括改动两条字幕样式后文本框重新排版后面的内容（与之后的字幕条数成正比，条数受列表视图阈值限制）
+def bench_subtitle_scroll(steps=50):
+    from ui import AudioSubtitleUI
+
+    ui = AudioSubtitleUI()
+    ui.resize(1200, 800)
+    ui.show()
+    cues = make_cues(AudioSubtitleUI.VIRTUAL_VIEW_THRESHOLD - 1)  # 文本框显示的最大条数
+    ui.update_subtitle_display(cues, 0)
+    QApplication.processEvents()
+
+    # 单独统计滚动定位的耗时
+    scroll_times = []
+    scroll_to_subtitle = ui._scroll_to_subtitle
+
+    def timed_scroll(index):
+        scroll_started = time.perf_counter()
+        scroll_to_subtitle(index)
+        scroll_times.append(time.perf_counter() - scroll_started)
+    ui._scroll_to_subtitle = timed_scroll
+
+    print(f"字幕高亮切换（文本框，共 {len(cues)} 条）")
+    print(f"{'current_index':>14} {'定位(ms)':>10} {'整次(ms)':>10}")
+    for start in (0, 250, 500, 1000, 1500, len(cues) - steps - 1):
+        ui.update_subtitle_display(cues, start)
+        scroll_times.clear()
+        started = time.perf_counter()
+        for i in range(start + 1, start + 1 + steps):
+            ui.update_subtitle_display(cues, i)
+        total = (time.perf_counter() - started) / steps
+        print(f"{start:>14} {sum(scroll_times) / steps * 1000:>10.3f} {total * 1000:>10.3f}")
+    ui.close()
+
+
+# 生成标记日志CSV：rows 条标记分布在 300 个音频文件中，每个音频内时间递增
+def make_mark_csv(path, rows):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["音频文件名", "开始时间（秒）", "结束时间（秒）", "开始时间格式", "结束时间格式", "备注"])
+        for i in range(rows):
+            start_sec = (i // 300) * 2.5
+            writer.writerow([f"lesson_{i % 300:03d}.mp3", start_sec, start_sec + 2.0, "", "", "remark" if i % 7 == 0 else ""])
+
+
+# 大标记日志的导入导出：分别测试内存列表（标记日志）和 SQLite 存储
+# 「重复导入」为同一文件再导入一次（每行都是重复标记），衡量流式去重的开销
+def bench_mark_csv(rows=1000000):
+    from log_handler import LogHandler
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        csv_path = os.path.join(tmp_dir, "marks.csv")
+        make_mark_csv(csv_path, rows)
+        print(f"标记日志导入导出（{rows} 行，{os.path.getsize(csv_path) / 1024 / 1024:.1f} MB）")
+        print(f"{'存储':>8} {'导入(s)':>9} {'重复导入(s)':>11} {'导出(s)':>9} {'导入(行/秒)':>12}")
+        for backend in ("journal", "sqlite"):
+            work_dir = os.path.join(tmp_dir, backend)
+            os.makedirs(work_dir)
+            config_path = os.path.join(work_dir, "config.ini")
+            with open(config_path, "w") as f:
+                f.write(f"[LastPlay]\naudio_path = \nprogress = 0\nfast_sec = 5\nsubtitle_hidden = False\n\n"
+                        f"[Storage]\nbackend = {backend}\ndatabase = {os.path.join(work_dir, 'marks.db')}\n")
+            log_handler = LogHandler(config_path, os.path.join(work_dir, "marks.journal"),
+                                     os.path.join(work_dir, "progress.json"))
+
+            started = time.perf_counter()
+            success, msg = log_handler.import_log(csv_path)
+            import_time = time.perf_counter() - started
+            if not success:
+                print(f"{backend:>8} {msg}")
+                continue
+            started = time.perf_counter()
+            log_handler.import_log(csv_path)
+            reimport_time = time.perf_counter() - started
+            started = time.perf_counter()
+            log_handler.export_log("", os.path.join(work_dir, "export.csv"))
+            export_time = time.perf_counter() - started
+            log_handler.close()
+            print(f"{backend:>8} {import_time:>9.2f} {reimport_time:>11.2f} {export_time:>9.2f} {rows / import_time:>12.0f}")
+
+
+BENCHMARKS = {
+    "subtitle_scroll": bench_subtitle_scroll,
+    "mark_csv": bench_mark_csv,
+}
+
+
+if __name__ == "__main__":
+    app = QApplication(sys.argv)
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        if name not in BENCHMARKS:
+            print(f"未知的测试：{name}（可选：{', '.join(BENCHMARKS)}）")
+            continue
+        BENCHMARKS[name]()
@@ -0,0 +1,75 @@
+import os
+import hashlib
+
+
+# 磁盘缓存的公共部分：按源文件绝对路径的哈希命名缓存文件，先写临时文件再替换，读取后更新修改时间作为最近使用时间
+# 所有磁盘缓存（字幕时间轴、MP3帧索引）共用一个大小上限，超出时在全部缓存目录中按最近使用淘汰
+# 缓存项的编码和校验由各缓存自己负责
+class DiskCache:
+    SUFFIX = ".bin"
+    _cache_dirs = set()  # 已创建的缓存目录（淘汰时统一统计大小）
+
+    def __init__(self, cache_dir, max_bytes=128 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes  # 所有缓存目录的总大小上限
+        DiskCache._cache_dirs.add(os.path.abspath(cache_dir))
+
+    # 缓存文件路径（同一源文件只保留一份，源文件变化后直接覆盖）
+    def entry_path(self, abs_path):
+        digest = hashlib.sha1(abs_path.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, digest + self.SUFFIX)
+
+    # 读取缓存文件内容，不存在或无法读取时返回 None
+    def read(self, abs_path):
+        try:
+            with open(self.entry_path(abs_path), "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    # 缓存项校验通过后调用：更新最近使用时间
+    def touch(self, abs_path):
+        try:
+            os.utime(self.entry_path(abs_path))
+        except OSError:
+            pass
+
+    # 写入缓存（先写临时文件再替换），之后按总大小上限淘汰；写入失败时抛出 OSError
+    def write(self, abs_path, parts):
+        entry_path = self.entry_path(abs_path)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = entry_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(b"".join(parts))
+        os.replace(tmp_path, entry_path)
+        self.evict()
+
+    # 所有缓存目录的总大小超出上限时删除最久未使用的缓存文件
+    def evict(self):
+        entries = []
+        total = 0
+        for cache_dir in sorted(DiskCache._cache_dirs):
+            try:
+                names = os.listdir(cache_dir)
+            except OSError:
+                continue
+            for name in names:
+                if not name.endswith(self.SUFFIX):
+                    continue
+                path = os.path.join(cache_dir, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+                total += st.st_size
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
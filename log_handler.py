@@ -1,14 +1,66 @@
+import io
 import os
 import csv
+import json
+import math
+import time
+import threading
 import configparser
 from datetime import datetime
+from mark_journal import MarkJournal
+from mark_database import MarkDatabase
+
+
+# 写入文件：先写临时文件并同步到磁盘，再替换原文件（中途崩溃不会留下写了一半的文件）
+def _atomic_write(path, text):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
 
 
 class LogHandler:
-    def __init__(self, config_path="config.ini"):
+    MARK_TOLERANCE = 1  # 重复标记的允许误差（秒），同时也是索引分桶的宽度
+    PROGRESS_SAVE_INTERVAL = 5  # 播放中保存续播位置的最短间隔（秒）
+    IO_CHUNK_ROWS = 10000  # 导入导出时每批处理的行数
+    MERGE_BATCH_ROWS = 1000  # 合并导入的标记时每次持有锁处理的条数（避免长时间阻塞界面线程）
+    MAX_REPORTED_ERRORS = 100  # 导入时最多记录的错误行数（其余只计数）
+
+    def __init__(self, config_path="config.ini", journal_path="marks.journal", progress_path="progress.json"):
         self.config_path = config_path
+        # 续播位置：{audio_name: 秒}（使用 SQLite 存储时保存在数据库中）
+        self.progress_path = progress_path
+        self._progress = {}
+        self._pending_progress = {}  # 尚未写入的续播位置
+        self._last_play = None  # 尚未写入配置的最近播放 (audio_path, progress)
+        self._last_progress_save = 0.0
         self.mark_logs = []  # 当前标记列表：[(audio_name, start_sec, end_sec, remark), ...]
+        self.mark_ids = []  # 与 mark_logs 一一对应的标记ID（列表项通过ID找到标记）
+        self._marks_by_id = {}  # 标记ID -> 标记
+        self._next_mark_id = 1
+        self.last_mark_id = None  # 最近一次添加成功的标记ID（界面只插入这一行）
+        self._display_texts = {}  # 标记ID -> 显示文本（每条标记只格式化一次）
+        # 重复检查索引：按音频分组、按开始时间分桶 {audio_name: {桶号: [(start_sec, end_sec), ...]}}
+        self._mark_index = {}
+        # 导入导出在后台线程中进行，修改和读取内存中的标记列表时加锁
+        self._lock = threading.RLock()
         self.init_config()
+        # 可选的 SQLite 存储（[Storage] backend = sqlite）：标记不再全部载入内存，按音频从数据库查询
+        self.mark_db = None
+        self.journal = None
+        storage = self.load_config()
+        if storage["storage_backend"] == "sqlite":
+            try:
+                self.mark_db = MarkDatabase(storage["database_path"], self.MARK_TOLERANCE)
+            except Exception as e:
+                print(f"打开标记数据库错误: {e}")
+        if self.mark_db is None:
+            # 标记日志：每次添加标记立即写入，启动时恢复上次的标记
+            self.journal = MarkJournal(journal_path)
+            self.load_marks()
+            self._progress = self._load_progress_file()
 
     # 初始化配置文件
     def init_config(self):
@@ -20,8 +72,24 @@ class LogHandler:
                 "fast_sec": "5",
                 "subtitle_hidden": "False"
             }
-            with open(self.config_path, "w") as f:
-                config.write(f)
+            config["Cache"] = {
+                "memory_mb": "64",
+                "pcm_mb": "128"
+            }
+            config["Storage"] = {
+                "backend": "journal",
+                "database": "listentrack.db"
+            }
+            self._write_config(config)
+
+    # 写入配置文件（先写临时文件再替换）
+    def _write_config(self, config):
+        try:
+            buffer = io.StringIO()
+            config.write(buffer)
+            _atomic_write(self.config_path, buffer.getvalue())
+        except OSError as e:
+            print(f"写入配置错误: {e}")
 
     # 保存配置（上次播放进度等）
     def save_config(self, audio_path, progress, fast_sec, subtitle_hidden):
@@ -33,8 +101,7 @@ class LogHandler:
             "fast_sec": str(fast_sec),
             "subtitle_hidden": str(subtitle_hidden)
         }
-        with open(self.config_path, "w") as f:
-            config.write(f)
+        self._write_config(config)
 
     # 加载配置
     def load_config(self):
@@ -44,29 +111,176 @@ class LogHandler:
             "audio_path": config["LastPlay"]["audio_path"],
             "progress": float(config["LastPlay"]["progress"]),
             "fast_sec": int(config["LastPlay"]["fast_sec"]),
-            "subtitle_hidden": config["LastPlay"]["subtitle_hidden"] == "True"
+            "subtitle_hidden": config["LastPlay"]["subtitle_hidden"] == "True",
+            "cache_memory_mb": config.getint("Cache", "memory_mb", fallback=64),
+            "pcm_cache_mb": config.getint("Cache", "pcm_mb", fallback=128),
+            "storage_backend": config.get("Storage", "backend", fallback="journal"),
+            "database_path": config.get("Storage", "database", fallback="listentrack.db")
         }
 
     # 添加标记记录（带重复检查）
     def add_mark(self, audio_name, start_sec, end_sec, remark=""):
-        # 检查是否已存在相同的标记（允许1秒误差）
-        for mark in self.mark_logs:
-            existing_audio, existing_start, existing_end, _ = mark
-            if (existing_audio == audio_name and
-                    abs(existing_start - start_sec) < 1 and
-                    abs(existing_end - end_sec) < 1):
+        if self.mark_db is not None:
+            mark_id = self.mark_db.add_mark(audio_name, start_sec, end_sec, remark)
+            if mark_id is None:
                 return False, "该片段已标记"
+            self.last_mark_id = mark_id
+            return True, "标记成功"
 
-        self.mark_logs.append((audio_name, start_sec, end_sec, remark))
+        with self._lock:
+            # 检查是否已存在相同的标记（允许1秒误差）
+            if self.is_duplicate_mark(audio_name, start_sec, end_sec):
+                return False, "该片段已标记"
+
+            mark = (audio_name, start_sec, end_sec, remark)
+            self.last_mark_id = self._append_mark(mark)
+            self._index_mark(audio_name, start_sec, end_sec)
+            self.journal.append([mark])
         return True, "标记成功"
 
-    # 清空标记记录
-    def clear_marks(self):
+    # 分配标记ID并加入列表
+    def _append_mark(self, mark):
+        mark_id = self._next_mark_id
+        self._next_mark_id += 1
+        self.mark_logs.append(mark)
+        self.mark_ids.append(mark_id)
+        self._marks_by_id[mark_id] = mark
+        return mark_id
+
+    # 按ID获取标记：(audio_name, start_sec, end_sec, remark)，不存在时返回 None
+    def get_mark(self, mark_id):
+        if self.mark_db is not None:
+            return self.mark_db.get_mark(mark_id)
+        return self._marks_by_id.get(mark_id)
+
+    # 是否有标记记录
+    def has_marks(self):
+        if self.mark_db is not None:
+            return self.mark_db.has_marks()
+        return bool(self.mark_logs)
+
+    # 是否已有同一音频、开始和结束时间都在误差范围内的标记
+    # 开始时间相差小于一个桶宽，只需要检查相邻的三个桶
+    def is_duplicate_mark(self, audio_name, start_sec, end_sec):
+        buckets = self._mark_index.get(audio_name)
+        if not buckets:
+            return False
+        bucket = int(start_sec // self.MARK_TOLERANCE)
+        for key in (bucket - 1, bucket, bucket + 1):
+            for existing_start, existing_end in buckets.get(key, ()):
+                if (abs(existing_start - start_sec) < self.MARK_TOLERANCE and
+                        abs(existing_end - end_sec) < self.MARK_TOLERANCE):
+                    return True
+        return False
+
+    # 把一条标记加入重复检查索引
+    def _index_mark(self, audio_name, start_sec, end_sec):
+        bucket = int(start_sec // self.MARK_TOLERANCE)
+        self._mark_index.setdefault(audio_name, {}).setdefault(bucket, []).append((start_sec, end_sec))
+
+    # 从标记日志恢复标记（启动时调用）
+    def load_marks(self):
+        self.mark_logs = self.journal.replay()
+        self._rebuild_mark_index()
+        self.journal.compact_if_needed(self.mark_logs)
+
+    # 标记列表整体替换后重新分配ID并重建索引
+    def _rebuild_mark_index(self):
+        marks = self.mark_logs
         self.mark_logs = []
+        self.mark_ids = []
+        self._marks_by_id = {}
+        self._mark_index = {}
+        self._display_texts = {}
+        for mark in marks:
+            self._append_mark(mark)
+            self._index_mark(mark[0], mark[1], mark[2])
+
+    # 清空标记记录
+    # 使用 SQLite 存储时列表只显示当前音频的标记，因此只删除 audio_name 的标记，其他音频的标记保留
+    def clear_marks(self, audio_name=""):
+        with self._lock:
+            if self.mark_db is not None:
+                if not audio_name:
+                    return
+                for mark_id in self.mark_db.clear_marks(audio_name):
+                    self._display_texts.pop(mark_id, None)
+                self._mark_index.pop(audio_name, None)
+                return
+            self.mark_logs = []
+            self.mark_ids = []
+            self._marks_by_id = {}
+            self._mark_index = {}
+            self._display_texts = {}
+            self.journal.append_clear()
+
+    # 记录音频的续播位置：播放中频繁调用，最多每 PROGRESS_SAVE_INTERVAL 秒写入一次，force 时立即写入
+    def save_progress(self, audio_path, position, force=False):
+        self._pending_progress[os.path.basename(audio_path)] = position
+        self._last_play = (audio_path, position)
+        if force or time.monotonic() - self._last_progress_save >= self.PROGRESS_SAVE_INTERVAL:
+            self.flush_progress()
+
+    # 写入尚未保存的续播位置，并在配置中记录最近播放的音频（启动时恢复）
+    def flush_progress(self):
+        if self._last_play is None:
+            return
+        pending, self._pending_progress = self._pending_progress, {}
+        audio_path, progress = self._last_play
+        self._last_play = None
+        self._last_progress_save = time.monotonic()
+        try:
+            if self.mark_db is not None:
+                self.mark_db.save_progress(pending)
+            else:
+                self._progress.update(pending)
+                _atomic_write(self.progress_path, json.dumps(self._progress, ensure_ascii=False))
+        except Exception as e:
+            print(f"保存播放位置错误: {e}")
+
+        config = configparser.ConfigParser()
+        config.read(self.config_path)
+        if not config.has_section("LastPlay"):
+            config.add_section("LastPlay")
+        config["LastPlay"]["audio_path"] = audio_path
+        config["LastPlay"]["progress"] = str(progress)
+        self._write_config(config)
 
-    # 导出标记日志为CSV
-    def export_log(self, audio_folder, export_path=None):
-        if not self.mark_logs:
+    # 获取音频的续播位置，没有记录时返回 None
+    def get_progress(self, audio_name):
+        if audio_name in self._pending_progress:
+            return self._pending_progress[audio_name]
+        if self.mark_db is not None:
+            return self.mark_db.get_progress(audio_name)
+        return self._progress.get(audio_name)
+
+    # 读取续播位置文件
+    def _load_progress_file(self):
+        try:
+            with open(self.progress_path, "r", encoding="utf-8") as f:
+                return {name: float(position) for name, position in json.load(f).items()}
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError, TypeError, AttributeError) as e:
+            print(f"读取播放位置错误: {e}")
+            return {}
+
+    # 记录一次播放（仅 SQLite 存储）
+    def record_play(self, audio_name):
+        if self.mark_db is not None:
+            self.mark_db.record_play(audio_name)
+
+    # 关闭标记日志或数据库（退出程序前调用）
+    def close(self):
+        self.flush_progress()
+        if self.mark_db is not None:
+            self.mark_db.close()
+        else:
+            self.journal.close()
+
+    # 导出标记日志为CSV：按批格式化并写入，progress(已写入条数, 总条数) 在每批后调用
+    def export_log(self, audio_folder, export_path=None, progress=None):
+        if not self.has_marks():
             return False, "无标记记录可导出"
 
         # 生成默认导出路径
@@ -75,60 +289,166 @@ class LogHandler:
             folder_name = os.path.basename(audio_folder) if audio_folder else "unknown"
             export_path = f"听力标记日志_{folder_name}_{timestamp}.csv"
 
+        if self.mark_db is not None:
+            marks = self.mark_db.iter_marks()  # 逐批从数据库读取
+            total = self.mark_db.count_marks()
+        else:
+            with self._lock:
+                marks = list(self.mark_logs)  # 导出期间仍可继续添加标记
+            total = len(marks)
+
         # 写入CSV
-        with open(export_path, "w", newline="", encoding="utf-8") as f:
-            writer = csv.writer(f)
-            writer.writerow(["音频文件名", "开始时间（秒）", "结束时间（秒）", "开始时间格式", "结束时间格式", "备注"])
-            for audio_name, start_sec, end_sec, remark in self.mark_logs:
-                start_time = self.sec_to_time(start_sec)
-                end_time = self.sec_to_time(end_sec)
-                writer.writerow([audio_name, start_sec, end_sec, start_time, end_time, remark])
+        try:
+            with open(export_path, "w", newline="", encoding="utf-8", buffering=1024 * 1024) as f:
+                writer = csv.writer(f)
+                writer.writerow(["音频文件名", "开始时间（秒）", "结束时间（秒）", "开始时间格式", "结束时间格式", "备注"])
+                rows = []
+                written = 0
+                for audio_name, start_sec, end_sec, remark in marks:
+                    rows.append((audio_name, start_sec, end_sec, self.sec_to_time(start_sec),
+                                 self.sec_to_time(end_sec), remark))
+                    if len(rows) >= self.IO_CHUNK_ROWS:
+                        writer.writerows(rows)
+                        written += len(rows)
+                        rows = []
+                        if progress is not None:
+                            progress(written, total)
+                writer.writerows(rows)
+                written += len(rows)
+                if progress is not None:
+                    progress(written, total)
+        except OSError as e:
+            return False, f"导出失败：{str(e)}"
 
         return True, f"日志已导出至：{export_path}"
 
-    # 导入标记日志（CSV）
-    def import_log(self, import_path):
+    # 导入标记日志（CSV）：逐批读取并合并到现有标记中，读取时即跳过已存在的片段
+    # progress(已读取字节数, 文件总字节数) 在每批后调用；格式错误的行跳过，(行号, 原因) 记录到 errors 中
+    def import_log(self, import_path, progress=None, errors=None):
         if not os.path.exists(import_path):
             return False, "文件不存在"
 
+        added = skipped = 0
+        counter = {"failed": 0}
+
+        def on_error(line_num, reason):
+            counter["failed"] += 1
+            if errors is not None and len(errors) < self.MAX_REPORTED_ERRORS:
+                errors.append((line_num, reason))
+
         try:
-            with open(import_path, "r", encoding="utf-8") as f:
-                reader = csv.reader(f)
-                next(reader)  # 跳过表头
-                self.mark_logs = []
-                for row in reader:
-                    if len(row) < 5:
-                        continue
-                    audio_name = row[0]
-                    start_sec = float(row[1])
-                    end_sec = float(row[2])
-                    remark = row[5] if len(row) > 5 else ""
-                    self.mark_logs.append((audio_name, start_sec, end_sec, remark))
-            return True, f"成功导入 {len(self.mark_logs)} 条记录"
+            total_bytes = os.path.getsize(import_path)
+            with open(import_path, "rb") as f:
+                for marks, bytes_read in self._read_csv_chunks(f, on_error):
+                    chunk_added, chunk_skipped = self._merge_marks(marks)
+                    added += chunk_added
+                    skipped += chunk_skipped
+                    if progress is not None:
+                        progress(bytes_read, total_bytes)
         except Exception as e:
-            return False, f"导入失败：{str(e)}"
-
-    # 时间格式转换（秒 → 00:00:00）
-    @staticmethod
-    def sec_to_time(sec):
-        hours = int(sec // 3600)
-        minutes = int((sec % 3600) // 60)
-        seconds = int(sec % 60)
-        return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
-
-    # 获取标记列表的显示文本（供UI展示）
-    def get_mark_display_texts(self):
-        return [
-            f"{self.sec_to_time(start_sec)} - {self.sec_to_time(end_sec)} （{audio_name}）{remark if remark else ''}"
-            for audio_name, start_sec, end_sec, remark in self.mark_logs
-        ]
-
-    # 解析标记文本获取开始时间（秒）
-    def parse_mark_start_sec(self, mark_text):
-        # 从"00:00:00 - 00:00:05 （音频名）"中提取开始时间
-        try:
-            start_time_str = mark_text.split(" - ")[0].strip()
-            hours, minutes, seconds = map(int, start_time_str.split(":"))
-            return hours * 3600 + minutes * 60 + seconds
-        except Exception:
-            return 0
\ No newline at end of file
+            return False, f"导入失败：{str(e)}（已导入 {added} 条记录）"
+
+        msg = f"成功导入 {added} 条记录（跳过 {skipped} 条重复记录"
+        if counter["failed"]:
+            msg += f"，{counter['failed']} 行格式错误"
+        return True, msg + "）"
+
+    # 合并一批标记，返回 (新增条数, 跳过条数)；每 MERGE_BATCH_ROWS 条加锁一次，新标记按小批写入标记日志或数据库
+    def _merge_marks(self, marks):
+        if self.mark_db is not None:
+            return self.mark_db.add_marks(marks)
+
+        added_count = 0
+        for batch_start in range(0, len(marks), self.MERGE_BATCH_ROWS):
+            added = []
+            with self._lock:
+                for mark in marks[batch_start:batch_start + self.MERGE_BATCH_ROWS]:
+                    audio_name, start_sec, end_sec, _ = mark
+                    if self.is_duplicate_mark(audio_name, start_sec, end_sec):
+                        continue
+                    self._append_mark(mark)
+                    self._index_mark(audio_name, start_sec, end_sec)
+                    added.append(mark)
+                self.journal.append(added)
+            added_count += len(added)
+        return added_count, len(marks) - added_count
+
+    # 按批读取CSV中的标记：每次产生 ([(audio_name, start_sec, end_sec, remark), ...], 已读取字节数)
+    def _read_csv_chunks(self, f, on_error):
+        position = {"bytes": 0}
+
+        def lines():
+            for line in f:
+                position["bytes"] += len(line)
+                yield line.decode("utf-8")
+
+        reader = csv.reader(lines())
+        next(reader, None)  # 跳过表头
+        marks = []
+        for row in reader:
+            if len(row) < 5:
+                if row:
+                    on_error(reader.line_num, "列数不足")
+                continue
+            try:
+                start_sec = float(row[1])
+                end_sec = float(row[2])
+            except ValueError:
+                on_error(reader.line_num, "时间格式错误")
+                continue
+            if not (math.isfinite(start_sec) and math.isfinite(end_sec)):
+                on_error(reader.line_num, "时间格式错误")
+                continue
+            marks.append((row[0], start_sec, end_sec, row[5] if len(row) > 5 else ""))
+            if len(marks) >= self.IO_CHUNK_ROWS:
+                yield marks, position["bytes"]
+                marks = []
+        yield marks, position["bytes"]
+
+    # 时间格式转换（秒 → 00:00:00），按整秒缓存格式化结果（导出大量标记时同一秒会重复出现）
+    _time_texts = {}
+
+    @classmethod
+    def sec_to_time(cls, sec):
+        whole = int(sec)
+        text = cls._time_texts.get(whole)
+        if text is None:
+            if len(cls._time_texts) >= 100000:
+                cls._time_texts.clear()
+            hours, rest = divmod(whole, 3600)
+            minutes, seconds = divmod(rest, 60)
+            text = f"{hours:02d}:{minutes:02d}:{seconds:02d}"
+            cls._time_texts[whole] = text
+        return text
+
+    # 获取指定音频的所有标记片段：[(start_sec, end_sec), ...]（从按音频分组的重复检查索引中取出，不扫描全部标记）
+    def get_mark_ranges(self, audio_name):
+        if self.mark_db is not None:
+            return self.mark_db.get_mark_ranges(audio_name)
+        with self._lock:
+            buckets = self._mark_index.get(audio_name, {})
+            return sorted(mark_range for bucket in buckets.values() for mark_range in bucket)
+
+    # 获取标记列表的显示项（供UI展示）：[(mark_id, 显示文本), ...]
+    # 使用 SQLite 存储时只查询当前音频的标记（没有当前音频时为空），否则显示全部标记
+    def get_mark_display_items(self, current_audio=""):
+        if self.mark_db is not None:
+            marks = self.mark_db.get_marks(current_audio) if current_audio else []
+        else:
+            with self._lock:
+                marks = list(zip(self.mark_ids, self.mark_logs))
+        return [(mark_id, self._display_text(mark_id, mark)) for mark_id, mark in marks]
+
+    # 获取单条标记的显示项：(mark_id, 显示文本)，不存在时返回 None
+    def get_mark_display_item(self, mark_id):
+        mark = self.get_mark(mark_id)
+        return (mark_id, self._display_text(mark_id, mark)) if mark is not None else None
+
+    # 标记的显示文本（按标记ID缓存）
+    def _display_text(self, mark_id, mark):
+        text = self._display_texts.get(mark_id)
+        if text is None:
+            audio_name, start_sec, end_sec, remark = mark
+            text = f"{self.sec_to_time(start_sec)} - {self.sec_to_time(end_sec)} （{audio_name}）{remark if remark else ''}"
+            self._display_texts[mark_id] = text
+        return text
\ No newline at end of file
@@ -1,11 +1,15 @@
 import sys
 import os
 from PyQt5.QtWidgets import QApplication
-from PyQt5.QtCore import QTimer
 from ui import AudioSubtitleUI
 from audio_handler import AudioHandler
 from subtitle_handler import SubtitleHandler
 from log_handler import LogHandler
+from media_cache import MediaCache
+from metadata_prefetcher import MetadataPrefetcher
+from audio_loader import AsyncAudioLoader
+from playback_scheduler import PlaybackScheduler
+from mark_io import AsyncMarkIO
 from PyQt5.QtWidgets import QFileDialog
 import re
 
@@ -13,16 +17,29 @@ import re
 class MainApp:
     def __init__(self):
         self.ui = AudioSubtitleUI()
-        self.audio_handler = AudioHandler()
-        self.subtitle_handler = SubtitleHandler()
         self.log_handler = LogHandler()
+        # 最近加载的字幕与音频信息缓存（切换曲目时不再重复读取解析）
+        config = self.log_handler.load_config()
+        self.media_cache = MediaCache(config["cache_memory_mb"] * 1024 * 1024)
+        self.audio_handler = AudioHandler(memory_cache=self.media_cache,
+                                          pcm_cache_bytes=config["pcm_cache_mb"] * 1024 * 1024)
+        self.subtitle_handler = SubtitleHandler(memory_cache=self.media_cache)
+        # 后台预读音频文件夹中的文件信息
+        self.metadata_prefetcher = MetadataPrefetcher(self.audio_handler)
+        # 在后台线程加载音频，避免界面卡顿
+        self.audio_loader = AsyncAudioLoader(self.audio_handler)
+        # 在后台线程导入导出标记日志
+        self.mark_io = AsyncMarkIO(self.log_handler)
+        self.audio_files = []  # 当前音频列表中的文件名
         self.audio_folder = ""  # 当前音频文件夹路径
         self.subtitle_folder = ""  # 当前字幕文件夹路径
-        self.playing_segment = False  # 是否正在播放标记片段
-        self.segment_end_time = 0  # 标记片段的结束时间
+        self.playing_segment = False  # 是否正在播放标记片段（片段终点的循环/停止由 AudioHandler 处理）
+        self._resume_request_id = None  # 启动时恢复上次音频的加载请求（加载后停在上次位置，不自动播放）
+        # 播放中在字幕边界和片段终点唤醒刷新界面，暂停时不运行定时器
+        self.scheduler = PlaybackScheduler(self.audio_handler, self.subtitle_handler,
+                                           self.refresh_progress, self.refresh_progress_label)
         self.init_signals()
         self.load_last_config()  # 加载上次配置
-        self.start_progress_timer()  # 启动进度更新定时器
 
     # 快进处理函数（修复版）
     def handle_forward(self, sec):
@@ -30,9 +47,11 @@ class MainApp:
             # 如果正在播放标记片段，退出标记片段模式
             if self.playing_segment:
                 self.playing_segment = False
+                self.audio_handler.clear_loop()
 
             success, msg = self.audio_handler.fast_seek(sec, is_forward=True)
             if success:
+                self.subtitle_handler.reset_cue_cursor()
                 self.ui.update_play_btn_text(self.audio_handler.is_playing)
                 self.update_progress()
             else:
@@ -47,9 +66,11 @@ class MainApp:
             # 如果正在播放标记片段，退出标记片段模式
             if self.playing_segment:
                 self.playing_segment = False
+                self.audio_handler.clear_loop()
 
             success, msg = self.audio_handler.fast_seek(sec, is_forward=False)
             if success:
+                self.subtitle_handler.reset_cue_cursor()
                 self.ui.update_play_btn_text(self.audio_handler.is_playing)
                 self.update_progress()
             else:
@@ -67,11 +88,12 @@ class MainApp:
         self.ui.play_pause_signal.connect(self.play_pause_audio)
         self.ui.fast_forward_signal.connect(self.handle_forward)
         self.ui.fast_backward_signal.connect(self.handle_backward)
-        self.ui.speed_combo.currentTextChanged.connect(self.change_playback_speed)
+        self.ui.playback_speed_changed_signal.connect(self.change_playback_speed)
         # 标记功能
         self.ui.mark_signal.connect(self.add_mark)
         self.ui.export_log_signal.connect(self.export_mark_log)
         self.ui.import_log_signal.connect(self.import_mark_log)
+        self.ui.clear_marks_signal.connect(self.clear_mark_log)
         # 字幕隐藏/显示
         self.ui.toggle_subtitle_signal.connect(self.toggle_subtitle)
         # 列表双击事件
@@ -81,6 +103,13 @@ class MainApp:
         # 字体和颜色设置
         self.ui.font_size_changed_signal.connect(self.on_font_size_changed)
         self.ui.highlight_color_changed_signal.connect(self.on_highlight_color_changed)
+        # 后台预读结果
+        self.metadata_prefetcher.file_probed.connect(self.on_audio_info_probed)
+        # 后台加载音频完成
+        self.audio_loader.audio_loaded.connect(self.on_audio_loaded)
+        # 标记日志导入导出进度与结果
+        self.mark_io.progress.connect(self.on_mark_io_progress)
+        self.mark_io.finished.connect(self.on_mark_io_finished)
 
     # 字体大小改变处理
     def on_font_size_changed(self, size):
@@ -102,27 +131,9 @@ class MainApp:
             if not folder:  # 用户点击"取消"，直接返回
                 return
 
-            # 确保路径编码正确
-            self.audio_folder = os.path.abspath(folder)
-            if not os.path.isdir(self.audio_folder):
+            if not self.open_audio_folder(folder):
                 self.ui.show_msg("错误", "选择的路径不是有效的文件夹")
                 return
-
-            # 筛选音频文件（支持mp3、wav、flac）
-            audio_ext = (".mp3", ".wav", ".flac")
-            # 增强文件筛选的容错性
-            audio_files = []
-            for f in os.listdir(self.audio_folder):
-                # 跳过隐藏文件（避免系统隐藏文件导致的问题）
-                if f.startswith('.'):
-                    continue
-                if f.lower().endswith(audio_ext):
-                    audio_files.append(f)
-
-            # 按文件名自然排序
-            audio_files = self.natural_sort(audio_files)
-
-            self.ui.update_audio_list(audio_files)
             # 不显示弹窗
             # self.ui.show_msg("提示", f"已加载 {len(audio_files)} 个音频文件")
 
@@ -133,6 +144,33 @@ class MainApp:
             self.ui.show_msg("错误", f"选择音频文件夹失败：{str(e)}")
             print(f"音频文件夹选择错误：{e}")
 
+    # 打开音频文件夹并显示其中的音频文件，不是有效文件夹时返回 False
+    def open_audio_folder(self, folder):
+        # 确保路径编码正确
+        self.audio_folder = os.path.abspath(folder)
+        if not os.path.isdir(self.audio_folder):
+            return False
+
+        # 筛选音频文件（支持mp3、wav、flac）
+        audio_ext = (".mp3", ".wav", ".flac")
+        # 增强文件筛选的容错性
+        audio_files = []
+        for f in os.listdir(self.audio_folder):
+            # 跳过隐藏文件（避免系统隐藏文件导致的问题）
+            if f.startswith('.'):
+                continue
+            if f.lower().endswith(audio_ext):
+                audio_files.append(f)
+
+        # 按文件名自然排序
+        audio_files = self.natural_sort(audio_files)
+
+        self.audio_files = audio_files
+        self.ui.update_audio_list(audio_files)
+        # 后台预读时长、码率、采样率和同名字幕，结果陆续显示在列表中
+        self.metadata_prefetcher.start(self.audio_folder, audio_files, self.subtitle_folder)
+        return True
+
     # 选择字幕文件夹
     def select_subtitle_folder(self):
         try:
@@ -151,13 +189,23 @@ class MainApp:
             subtitle_files = self.natural_sort(subtitle_files)
 
             self.ui.update_subtitle_list(subtitle_files)
+            # 重新检测音频列表的同名字幕（音频信息已在缓存中）
+            if self.audio_files:
+                self.metadata_prefetcher.start(self.audio_folder, self.audio_files, self.subtitle_folder)
             # 不显示弹窗
             # self.ui.show_msg("提示", f"已加载 {len(subtitle_files)} 个字幕文件")
         except Exception as e:
             self.ui.show_msg("错误", f"选择字幕文件夹失败：{str(e)}")
             print(f"字幕文件夹选择错误：{e}")
 
+    # 后台预读到一个音频文件的信息
+    def on_audio_info_probed(self, generation, audio_name, info):
+        if generation != self.metadata_prefetcher.generation:
+            return  # 已切换文件夹，丢弃旧结果
+        self.ui.update_audio_item_info(audio_name, info)
+
     # 加载并播放音频（修复版，双击后自动播放）
+    # 音频在后台线程加载，完成后在 on_audio_loaded 中开始播放；加载期间再次双击会取消之前的请求
     def load_and_play_audio(self, audio_name):
         try:
             if not self.audio_folder:
@@ -167,18 +215,43 @@ class MainApp:
             audio_path = os.path.join(self.audio_folder, audio_name)
             print(f"尝试加载音频: {audio_path}")  # 调试信息
 
-            success, msg = self.audio_handler.load_audio(audio_path)
-            if success:
-                self.ui.current_audio = audio_name
-                # 自动播放
-                self.audio_handler.play_pause()
-                self.ui.update_play_btn_text(True)
+            self.playing_segment = False
+            self.save_current_progress()
+            # 加载期间（以及加载失败后）没有当前音频，不能再按上一首音频添加标记
+            self.ui.current_audio = ""
+            self.audio_loader.load(audio_path)
+            self.ui.update_play_btn_text(False)
+        except Exception as e:
+            print(f"加载音频错误: {e}")
+            import traceback
+            traceback.print_exc()
 
-                # 尝试自动加载同名字幕
-                self.auto_load_subtitle(audio_name)
-            else:
+    # 音频加载完成（自动播放并加载同名字幕）
+    def on_audio_loaded(self, request_id, audio_path, success, msg, elapsed):
+        try:
+            if not success:
                 # 不显示错误弹窗
-                pass
+                print(f"加载音频失败: {msg}")
+                return
+
+            audio_name = os.path.basename(audio_path)
+            self.ui.current_audio = audio_name
+            self.log_handler.record_play(audio_name)
+            self.refresh_mark_list()
+            # 从上次的位置继续（已播放到结尾时从头开始）
+            position = self.log_handler.get_progress(audio_name)
+            if position and position < self.audio_handler.total_duration - 1:
+                self.audio_handler.seek_to(position)
+            # 自动播放（启动时恢复的音频只定位，不自动播放）
+            if request_id != self._resume_request_id:
+                self.audio_handler.play_pause()
+            self.ui.update_play_btn_text(self.audio_handler.is_playing)
+
+            # 尝试自动加载同名字幕
+            self.auto_load_subtitle(audio_name)
+            # 预先解码该音频的标记片段
+            self.update_prefetch_marks()
+            self.update_progress()
         except Exception as e:
             print(f"加载音频错误: {e}")
             import traceback
@@ -194,8 +267,8 @@ class MainApp:
             success, msg = self.subtitle_handler.load_subtitle(subtitle_path)
             if success:
                 self.ui.current_subtitle = subtitle_name
-                # 立即更新一次字幕显示
-                self.update_subtitle_display()
+                # 立即更新一次字幕显示（字幕边界改变，重新安排刷新）
+                self.update_progress()
             else:
                 # 不显示错误弹窗
                 pass
@@ -207,20 +280,14 @@ class MainApp:
         if not self.subtitle_folder:
             return
 
-        # 获取音频文件名（不含扩展名）
-        audio_base = os.path.splitext(audio_name)[0]
-
         # 查找同名字幕文件
-        subtitle_ext = (".srt", ".txt")
-        for ext in subtitle_ext:
-            subtitle_name = audio_base + ext
+        subtitle_name = self.subtitle_handler.find_matching_subtitle(self.subtitle_folder, audio_name)
+        if subtitle_name:
             subtitle_path = os.path.join(self.subtitle_folder, subtitle_name)
-            if os.path.exists(subtitle_path):
-                success, msg = self.subtitle_handler.load_subtitle(subtitle_path)
-                if success:
-                    self.ui.current_subtitle = subtitle_name
-                    self.update_subtitle_display()
-                break
+            success, msg = self.subtitle_handler.load_subtitle(subtitle_path)
+            if success:
+                self.ui.current_subtitle = subtitle_name
+                self.update_subtitle_display()
 
     # 播放/暂停切换
     def play_pause_audio(self):
@@ -228,6 +295,7 @@ class MainApp:
             # 如果正在播放标记片段，退出标记片段模式
             if self.playing_segment:
                 self.playing_segment = False
+                self.audio_handler.clear_loop()
 
             success, msg = self.audio_handler.play_pause()
             if not success:
@@ -235,23 +303,26 @@ class MainApp:
                 pass
             else:
                 self.ui.update_play_btn_text(self.audio_handler.is_playing)
+                if not self.audio_handler.is_playing:
+                    self.save_current_progress()
                 # 立即更新一次进度显示
                 self.update_progress()
         except Exception as e:
             print(f"播放/暂停错误: {e}")
 
-    # 改变播放倍速
-    def change_playback_speed(self, speed_text):
+    # 改变播放倍速（0.01x ~ 3.00x）
+    def change_playback_speed(self, speed):
         try:
-            speed = float(speed_text.replace("x", ""))
             self.audio_handler.set_playback_speed(speed)
+            # 倍速改变后重新计算唤醒时间
+            self.update_progress()
         except Exception as e:
             print(f"改变倍速错误: {e}")
 
     # 添加标记（无弹窗）
     def add_mark(self):
         try:
-            if not self.ui.current_audio:
+            if not self.ui.current_audio or not self.audio_handler.current_audio_path:
                 return
 
             current_sec = self.audio_handler.get_current_progress()
@@ -272,15 +343,32 @@ class MainApp:
                 remark=""  # 可扩展为弹窗输入备注
             )
             if success:
-                # 更新UI标记列表
-                self.ui.update_mark_list(self.log_handler.get_mark_display_texts())
+                # 标记列表只添加新的一行
+                self.ui.add_mark_item(*self.log_handler.get_mark_display_item(self.log_handler.last_mark_id))
+                # 只预读新标记的片段
+                self.audio_handler.add_prefetch_range(start_sec, end_sec)
             # 无论成功还是重复，都不显示弹窗
         except Exception as e:
             print(f"添加标记错误: {e}")
 
+    # 刷新标记列表（使用 SQLite 存储时只显示当前音频的标记）
+    def refresh_mark_list(self):
+        self.ui.update_mark_list(self.log_handler.get_mark_display_items(self.ui.current_audio))
+
+    # 立即保存当前音频的播放位置（暂停、切换音频和退出时调用）
+    def save_current_progress(self):
+        if self.audio_handler.current_audio_path:
+            self.log_handler.save_progress(self.audio_handler.current_audio_path,
+                                           self.audio_handler.get_current_progress(), force=True)
+
+    # 让播放器预先解码当前音频的所有标记片段
+    def update_prefetch_marks(self):
+        if self.ui.current_audio:
+            self.audio_handler.set_prefetch_ranges(self.log_handler.get_mark_ranges(self.ui.current_audio))
+
     # 导出标记日志
     def export_mark_log(self):
-        if not self.log_handler.mark_logs:
+        if not self.log_handler.has_marks():
             return
         try:
             export_path, _ = QFileDialog.getSaveFileName(
@@ -294,7 +382,8 @@ class MainApp:
             # 确保文件后缀是.csv
             if not export_path.endswith(".csv"):
                 export_path += ".csv"
-            success, msg = self.log_handler.export_log(self.audio_folder, export_path)
+            if self.mark_io.start_export(self.audio_folder, export_path):
+                self.ui.set_mark_io_busy(True, "正在导出...")
             # 不显示成功弹窗
         except Exception as e:
             print(f"日志导出错误：{e}")
@@ -310,12 +399,40 @@ class MainApp:
             )
             if not import_path:  # 用户取消
                 return
-            success, msg = self.log_handler.import_log(import_path)
-            self.ui.update_mark_list(self.log_handler.get_mark_display_texts())
+            if self.mark_io.start_import(import_path):
+                self.ui.set_mark_io_busy(True, "正在导入...")
             # 不显示成功弹窗
         except Exception as e:
             print(f"日志导入错误：{e}")
 
+    # 导入导出进度（导入按字节，导出按条数）
+    def on_mark_io_progress(self, task, done, total):
+        percent = done * 100 // total if total > 0 else 100
+        self.ui.set_mark_io_busy(True, f"{'正在导入' if task == 'import' else '正在导出'} {percent}%")
+
+    # 导入导出完成：导入后刷新标记列表，格式错误的行输出到控制台
+    def on_mark_io_finished(self, task, success, msg, errors):
+        try:
+            self.ui.set_mark_io_busy(False, msg)
+            for line_num, reason in errors:
+                print(f"导入标记日志第 {line_num} 行{reason}，已跳过")
+            if not success:
+                print(f"日志{'导入' if task == 'import' else '导出'}错误：{msg}")
+            if task == "import":
+                self.refresh_mark_list()
+                self.update_prefetch_marks()
+        except Exception as e:
+            print(f"日志导入导出错误：{e}")
+
+    # 清空标记列表
+    def clear_mark_log(self):
+        try:
+            self.log_handler.clear_marks(self.ui.current_audio)
+            self.ui.update_mark_list([])
+            self.update_prefetch_marks()
+        except Exception as e:
+            print(f"清空标记错误：{e}")
+
     # 切换字幕显示/隐藏
     def toggle_subtitle(self):
         if self.subtitle_handler.is_hidden:
@@ -329,6 +446,7 @@ class MainApp:
         self.ui.is_subtitle_hidden = True
         self.ui.update_subtitle_display([], 0, is_hidden=True)
         self.ui.update_subtitle_btn_text(True)
+        self.scheduler.wake()
 
     # 显示字幕
     def show_subtitle(self):
@@ -336,17 +454,21 @@ class MainApp:
         self.ui.is_subtitle_hidden = False
         self.update_subtitle_display()
         self.ui.update_subtitle_btn_text(False)
+        self.scheduler.wake()
 
     # 跳转到标记位置并播放片段（修复版）
-    def jump_to_mark(self, mark_text):
+    def jump_to_mark(self, mark_id):
         try:
-            # 解析标记的开始时间和结束时间
-            start_sec, end_sec = self.parse_mark_start_end_sec(mark_text)
+            # 按列表项上的标记ID取出标记（精确到毫秒的开始和结束时间）
+            mark = self.log_handler.get_mark(mark_id)
+            if mark is None:
+                return
+            _, start_sec, end_sec, _ = mark
 
-            if start_sec > 0 and end_sec > start_sec and self.audio_handler.current_audio_path:
-                # 设置标记片段模式
+            if end_sec > start_sec and self.audio_handler.current_audio_path:
+                # 设置标记片段模式：播放器在片段终点回到起点，按设置的遍数播放后停止
                 self.playing_segment = True
-                self.segment_end_time = end_sec
+                self.audio_handler.set_loop(start_sec, end_sec, self.ui.loop_spin.value() or None)
 
                 # 保存当前的播放状态
                 was_playing = self.audio_handler.is_playing
@@ -354,6 +476,7 @@ class MainApp:
                 # 跳转到标记开始位置
                 success, msg = self.audio_handler.seek_to(start_sec)
                 if success:
+                    self.subtitle_handler.reset_cue_cursor()
                     # 如果音频当前是暂停状态，开始播放
                     if not self.audio_handler.is_playing:
                         self.audio_handler.play_pause()
@@ -362,70 +485,49 @@ class MainApp:
                     self.update_progress()
                 else:
                     self.playing_segment = False
+                    self.audio_handler.clear_loop()
         except Exception as e:
             print(f"跳转标记错误: {e}")
             self.playing_segment = False
+            self.audio_handler.clear_loop()
 
-    # 解析标记的开始和结束时间
-    def parse_mark_start_end_sec(self, mark_text):
-        # 从"00:00:00 - 00:00:05 （音频名）"中提取开始和结束时间
-        try:
-            # 分割开始时间和结束时间
-            time_part = mark_text.split(" （")[0]  # 获取时间部分
-            start_time_str, end_time_str = time_part.split(" - ")
-
-            # 解析开始时间
-            start_hours, start_minutes, start_seconds = map(int, start_time_str.split(":"))
-            start_sec = start_hours * 3600 + start_minutes * 60 + start_seconds
-
-            # 解析结束时间
-            end_hours, end_minutes, end_seconds = map(int, end_time_str.split(":"))
-            end_sec = end_hours * 3600 + end_minutes * 60 + end_seconds
-
-            return start_sec, end_sec
-        except Exception:
-            # 如果解析失败，返回默认值（当前时间到5秒后）
-            current_sec = self.audio_handler.get_current_progress()
-            return current_sec, current_sec + 5
-
-    # 启动进度更新定时器
-    def start_progress_timer(self):
-        self.timer = QTimer()
-        self.timer.timeout.connect(self.update_progress)
-        self.timer.start(50)  # 每50ms更新一次，减少延迟
-
-    # 更新进度显示和字幕高亮
+    # 更新进度显示和字幕高亮，并重新安排下一次刷新（播放状态、位置等改变后调用）
     def update_progress(self):
-        try:
-            current_time = self.audio_handler.get_current_progress()
-            total_time = self.audio_handler.total_duration
-            self.ui.update_progress(current_time, total_time)
-
-            # 检查是否到达标记片段的结束时间
-            if (self.playing_segment and
-                    self.audio_handler.is_playing and
-                    current_time >= self.segment_end_time):
-                # 暂停播放
-                self.audio_handler.play_pause()
-                self.ui.update_play_btn_text(False)
-                self.playing_segment = False
+        self.refresh_progress()
+        self.scheduler.wake()
 
-            self.update_subtitle_display()
+    # 刷新进度显示和字幕高亮（调度器在字幕边界、片段终点调用）
+    def refresh_progress(self):
+        try:
+            current_time = self.refresh_progress_label()
+            self.update_subtitle_display(current_time)
         except Exception as e:
             print(f"更新进度错误: {e}")
 
-    # 更新字幕显示（高亮当前句子）
-    def update_subtitle_display(self):
+    # 只刷新进度文字（调度器按较低频率调用），返回当前进度
+    def refresh_progress_label(self):
+        current_time = self.audio_handler.get_current_progress()
+        total_time = self.audio_handler.total_duration
+        self.ui.update_progress(current_time, total_time)
+        # 记录续播位置（最多每几秒写入一次）
+        if self.audio_handler.is_playing:
+            self.log_handler.save_progress(self.audio_handler.current_audio_path, current_time)
+
+        # 标记片段播放完所有遍数后播放器已停在片段终点，更新按钮状态
+        if self.playing_segment and not self.audio_handler.is_playing:
+            self.ui.update_play_btn_text(False)
+            self.playing_segment = False
+        return current_time
+
+    # 更新字幕显示（高亮当前句子），current_sec 为 None 时读取当前进度
+    def update_subtitle_display(self, current_sec=None):
         if self.subtitle_handler.is_hidden:
             return
 
         try:
-            current_sec = self.audio_handler.get_current_progress()
-            current_index = -1
-            for i, (start_sec, end_sec, text) in enumerate(self.subtitle_handler.subtitle_timelines):
-                if start_sec <= current_sec <= end_sec:
-                    current_index = i
-                    break
+            if current_sec is None:
+                current_sec = self.audio_handler.get_current_progress()
+            current_index = self.subtitle_handler.find_cue_index(current_sec)
 
             self.ui.update_subtitle_display(
                 self.subtitle_handler.subtitle_timelines,
@@ -438,10 +540,15 @@ class MainApp:
     # 加载上次配置
     def load_last_config(self):
         config = self.log_handler.load_config()
-        # 可以在这里添加恢复上次播放状态的逻辑
         self.ui.fast_sec_spin.setValue(config["fast_sec"])
         if config["subtitle_hidden"]:
             self.hide_subtitle()
+        # 显示从标记日志恢复的标记
+        self.refresh_mark_list()
+        # 打开上次播放的音频并定位到上次的位置
+        audio_path = config["audio_path"]
+        if audio_path and os.path.isfile(audio_path) and self.open_audio_folder(os.path.dirname(audio_path)):
+            self._resume_request_id = self.audio_loader.load(audio_path)
 
     # 自然排序函数
     def natural_sort(self, l):
@@ -453,7 +560,15 @@ class MainApp:
     # 运行应用
     def run(self):
         self.ui.show()
-        return app.exec_()
+        exit_code = app.exec_()
+        self.save_current_progress()
+        self.scheduler.stop()
+        self.metadata_prefetcher.shutdown()
+        self.audio_loader.shutdown()
+        self.mark_io.shutdown()
+        self.audio_handler.shutdown()
+        self.log_handler.close()
+        return exit_code
 
 
 if __name__ == "__main__":
@@ -0,0 +1,177 @@
+import time
+import sqlite3
+import threading
+from itertools import islice
+
+
+# SQLite 标记与播放记录存储（多音频、大量标记时代替内存列表 + 标记日志）
+# marks：标记片段，按 (音频名, 开始时间) 建索引，重复检查和按音频查询都走索引
+# progress：每个音频的续播位置；play_stats：每个音频的播放次数和最近播放时间
+# 导入导出等后台操作也会访问数据库，所有操作都在锁内进行
+class MarkDatabase:
+    BATCH_SIZE = 1000  # 批量写入时每个事务包含的条数
+    FETCH_SIZE = 1000  # 逐批读取时每次取出的条数
+
+    def __init__(self, db_path, tolerance=1):
+        self.db_path = db_path
+        self.tolerance = tolerance  # 重复标记的允许误差（秒）
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS marks (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                audio_name TEXT NOT NULL,
+                start_sec REAL NOT NULL,
+                end_sec REAL NOT NULL,
+                remark TEXT NOT NULL DEFAULT ''
+            );
+            CREATE INDEX IF NOT EXISTS idx_marks_audio_start ON marks (audio_name, start_sec);
+            CREATE TABLE IF NOT EXISTS progress (
+                audio_name TEXT PRIMARY KEY,
+                position REAL NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS play_stats (
+                audio_name TEXT PRIMARY KEY,
+                play_count INTEGER NOT NULL DEFAULT 0,
+                last_played REAL NOT NULL
+            );
+        """)
+
+    # 是否已有同一音频、开始和结束时间都在误差范围内的标记（按索引查找开始时间附近的标记）
+    def _is_duplicate(self, audio_name, start_sec, end_sec):
+        row = self._conn.execute(
+            "SELECT 1 FROM marks WHERE audio_name = ? AND start_sec > ? AND start_sec < ? "
+            "AND end_sec > ? AND end_sec < ? LIMIT 1",
+            (audio_name, start_sec - self.tolerance, start_sec + self.tolerance,
+             end_sec - self.tolerance, end_sec + self.tolerance)).fetchone()
+        return row is not None
+
+    # 添加一条标记，返回标记ID；已存在相同片段时返回 None
+    def add_mark(self, audio_name, start_sec, end_sec, remark=""):
+        with self._lock:
+            if self._is_duplicate(audio_name, start_sec, end_sec):
+                return None
+            cursor = self._conn.execute(
+                "INSERT INTO marks (audio_name, start_sec, end_sec, remark) VALUES (?, ?, ?, ?)",
+                (audio_name, start_sec, end_sec, remark))
+            return cursor.lastrowid
+
+    # 批量添加标记（可以是生成器），每 BATCH_SIZE 条一个事务，跳过已存在的片段
+    # 每个事务结束后释放锁，导入期间界面线程的添加标记、跳转等操作不会等待整批完成
+    # 返回 (新增条数, 跳过条数)；中途出错时已写入的标记同样保存
+    def add_marks(self, marks):
+        added = skipped = 0
+        marks = iter(marks)
+        while True:
+            batch = list(islice(marks, self.BATCH_SIZE))
+            if not batch:
+                return added, skipped
+            with self._lock:
+                self._conn.execute("BEGIN")
+                try:
+                    for audio_name, start_sec, end_sec, remark in batch:
+                        if self._is_duplicate(audio_name, start_sec, end_sec):
+                            skipped += 1
+                            continue
+                        self._conn.execute(
+                            "INSERT INTO marks (audio_name, start_sec, end_sec, remark) VALUES (?, ?, ?, ?)",
+                            (audio_name, start_sec, end_sec, remark))
+                        added += 1
+                finally:
+                    self._conn.execute("COMMIT")
+
+    # 按ID获取标记：(audio_name, start_sec, end_sec, remark)，不存在时返回 None
+    def get_mark(self, mark_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT audio_name, start_sec, end_sec, remark FROM marks WHERE id = ?", (mark_id,)).fetchone()
+        return tuple(row) if row is not None else None
+
+    # 获取指定音频的标记：[(mark_id, (audio_name, start_sec, end_sec, remark)), ...]
+    def get_marks(self, audio_name):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, audio_name, start_sec, end_sec, remark FROM marks WHERE audio_name = ? ORDER BY id",
+                (audio_name,)).fetchall()
+        return [(row[0], tuple(row[1:])) for row in rows]
+
+    # 获取指定音频的所有标记片段：[(start_sec, end_sec), ...]
+    def get_mark_ranges(self, audio_name):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT start_sec, end_sec FROM marks WHERE audio_name = ? ORDER BY start_sec",
+                (audio_name,)).fetchall()
+
+    # 逐批读取全部标记（导出时使用，不一次性载入内存）
+    def iter_marks(self):
+        last_id = 0
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT id, audio_name, start_sec, end_sec, remark FROM marks WHERE id > ? ORDER BY id LIMIT ?",
+                    (last_id, self.FETCH_SIZE)).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield tuple(row[1:])
+            last_id = rows[-1][0]
+
+    def count_marks(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM marks").fetchone()[0]
+
+    def has_marks(self):
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM marks LIMIT 1").fetchone() is not None
+
+    # 删除指定音频的全部标记，返回被删除的标记ID
+    def clear_marks(self, audio_name):
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                mark_ids = [row[0] for row in self._conn.execute(
+                    "SELECT id FROM marks WHERE audio_name = ?", (audio_name,))]
+                self._conn.execute("DELETE FROM marks WHERE audio_name = ?", (audio_name,))
+            finally:
+                self._conn.execute("COMMIT")
+        return mark_ids
+
+    # 保存续播位置：{audio_name: position}，在一个事务中写入
+    def save_progress(self, positions):
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO progress (audio_name, position, updated_at) VALUES (?, ?, ?)",
+                    [(audio_name, position, now) for audio_name, position in positions.items()])
+            finally:
+                self._conn.execute("COMMIT")
+
+    # 获取续播位置，没有记录时返回 None
+    def get_progress(self, audio_name):
+        with self._lock:
+            row = self._conn.execute("SELECT position FROM progress WHERE audio_name = ?", (audio_name,)).fetchone()
+        return row[0] if row is not None else None
+
+    # 记录一次播放
+    def record_play(self, audio_name):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO play_stats (audio_name, play_count, last_played) VALUES (?, 1, ?) "
+                "ON CONFLICT(audio_name) DO UPDATE SET play_count = play_count + 1, last_played = excluded.last_played",
+                (audio_name, time.time()))
+
+    # 获取播放统计：{"play_count": 次数, "last_played": 时间戳}，没有记录时返回 None
+    def get_play_stats(self, audio_name):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT play_count, last_played FROM play_stats WHERE audio_name = ?", (audio_name,)).fetchone()
+        return {"play_count": row[0], "last_played": row[1]} if row is not None else None
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
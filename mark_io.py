@@ -0,0 +1,71 @@
+from PyQt5.QtCore import QObject, QThread, pyqtSignal, pyqtSlot
+
+
+# 后台线程中的工作对象：执行标记日志的导入导出
+class _MarkIOWorker(QObject):
+    # 信号：任务类型（"import"/"export"）、已完成量、总量（导入按字节，导出按条数）
+    progress = pyqtSignal(str, int, int)
+    # 信号：任务类型、是否成功、提示信息、格式错误的行 [(行号, 原因), ...]
+    finished = pyqtSignal(str, bool, str, list)
+
+    def __init__(self, log_handler):
+        super().__init__()
+        self.log_handler = log_handler
+
+    @pyqtSlot(str, str, str)
+    def run(self, task, path, audio_folder):
+        errors = []
+        report = lambda done, total: self.progress.emit(task, done, total)
+        try:
+            if task == "import":
+                success, msg = self.log_handler.import_log(path, progress=report, errors=errors)
+            else:
+                success, msg = self.log_handler.export_log(audio_folder, path, progress=report)
+        except Exception as e:
+            success, msg = False, str(e)
+        self.finished.emit(task, success, msg, errors)
+
+
+# 异步导入导出标记日志：几十万行的日志在独立线程中逐批处理，界面不会卡住
+# 同一时间只执行一个任务
+class AsyncMarkIO(QObject):
+    task_requested = pyqtSignal(str, str, str)  # 发送给后台线程的任务：类型、文件路径、音频文件夹
+    progress = pyqtSignal(str, int, int)
+    finished = pyqtSignal(str, bool, str, list)
+
+    def __init__(self, log_handler):
+        super().__init__()
+        self.busy = False
+
+        self._thread = QThread()
+        self._worker = _MarkIOWorker(log_handler)
+        self._worker.moveToThread(self._thread)
+        self.task_requested.connect(self._worker.run)
+        self._worker.progress.connect(self.progress)
+        self._worker.finished.connect(self._on_worker_finished)
+        self._thread.start()
+
+    # 开始导入，已有任务在执行时返回 False
+    def start_import(self, import_path):
+        return self._start("import", import_path, "")
+
+    # 开始导出，已有任务在执行时返回 False
+    def start_export(self, audio_folder, export_path):
+        return self._start("export", export_path, audio_folder)
+
+    def _start(self, task, path, audio_folder):
+        if self.busy:
+            return False
+        self.busy = True
+        self.task_requested.emit(task, path, audio_folder)
+        return True
+
+    # 任务完成（在主线程中执行）
+    def _on_worker_finished(self, task, success, msg, errors):
+        self.busy = False
+        self.finished.emit(task, success, msg, errors)
+
+    # 停止后台线程（退出程序前调用，等待正在执行的任务完成）
+    def shutdown(self):
+        self._thread.quit()
+        self._thread.wait()
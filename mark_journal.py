@@ -0,0 +1,154 @@
+import os
+import json
+import time
+import threading
+from json.encoder import encode_basestring
+
+_DECODER = json.JSONDecoder()
+
+
+# 标记日志文件（只追加）：每次添加标记立即写入一行，程序崩溃也不会丢失本次的标记
+# 每行一条 JSON 记录：["A", audio_name, start_sec, end_sec, remark] 添加标记，["C"] 清空标记
+# 写入后立即交给系统；fsync 最多每 FSYNC_INTERVAL 秒一次（之后的写入由定时器补上）
+# 启动时重放全部记录得到当前标记，无效记录较多时重写为只包含当前标记的新文件
+class MarkJournal:
+    FSYNC_INTERVAL = 2.0  # fsync 的最短间隔（秒）
+
+    def __init__(self, journal_path):
+        self.journal_path = journal_path
+        self._file = None
+        self._lock = threading.Lock()  # fsync 定时器在后台线程运行
+        self._last_sync = 0.0
+        self._sync_timer = None
+        self.record_count = 0  # 日志文件中的记录条数（用于判断是否需要压缩）
+        self._damaged = False  # 文件中有无法解析的记录或不完整的末行
+
+    # 重放日志，返回当前标记列表：[(audio_name, start_sec, end_sec, remark), ...]
+    def replay(self):
+        marks = []
+        self.record_count = 0
+        self._damaged = False
+        try:
+            with open(self.journal_path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return marks
+        except OSError as e:
+            print(f"读取标记日志错误: {e}")
+            return marks
+
+        lines = data.decode("utf-8", errors="replace").split("\n")
+        if lines[-1]:
+            # 写入中途崩溃留下的不完整末行
+            self._damaged = True
+        lines.pop()
+        try:
+            # 所有记录拼成一个数组一次解析；有无法解析的行时再逐行解析，跳过损坏的行
+            records = _DECODER.decode("[" + ",".join(lines) + "]")
+        except ValueError:
+            records = []
+            for line in lines:
+                try:
+                    records.append(_DECODER.decode(line))
+                except ValueError:
+                    self._damaged = True
+
+        for record in records:
+            # 每条记录都是数组，其他类型（部分写入或手工修改的行）按损坏处理
+            if not isinstance(record, list):
+                self._damaged = True
+                continue
+            try:
+                if record[0] == "A":
+                    if not isinstance(record[1], str) or not isinstance(record[4], str):
+                        raise TypeError(record)
+                    marks.append((record[1], float(record[2]), float(record[3]), record[4]))
+                elif record[0] == "C":
+                    marks = []
+                else:
+                    raise ValueError(record[0])
+                self.record_count += 1
+            except (ValueError, IndexError, TypeError):
+                self._damaged = True
+        return marks
+
+    # 重放后调用：文件损坏或无效记录（被清空的标记）多于当前标记时重写日志
+    def compact_if_needed(self, marks):
+        if self._damaged or self.record_count - len(marks) > len(marks):
+            self.compact(marks)
+
+    # 用当前标记重写日志（先写临时文件再替换）
+    def compact(self, marks):
+        with self._lock:
+            self._close_file()
+            tmp_path = self.journal_path + ".tmp"
+            try:
+                with open(tmp_path, "w", encoding="utf-8", newline="\n") as f:
+                    f.writelines(self._format_add(mark) for mark in marks)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.journal_path)
+                self.record_count = len(marks)
+                self._damaged = False
+            except OSError as e:
+                print(f"压缩标记日志错误: {e}")
+
+    # 追加标记（一次写入多条，导入时整批写入）
+    def append(self, marks):
+        if marks:
+            self._write("".join(self._format_add(mark) for mark in marks), len(marks))
+
+    # 追加清空记录
+    def append_clear(self):
+        self._write(json.dumps(["C"]) + "\n", 1)
+
+    # 直接拼出一行 JSON（时间均为有限的数值，repr 与 JSON 的数字格式一致），比 json.dumps 快数倍
+    @staticmethod
+    def _format_add(mark):
+        audio_name, start_sec, end_sec, remark = mark
+        return f'["A", {encode_basestring(audio_name)}, {start_sec!r}, {end_sec!r}, {encode_basestring(remark)}]\n'
+
+    def _write(self, text, count):
+        with self._lock:
+            try:
+                if self._file is None:
+                    self._file = open(self.journal_path, "a", encoding="utf-8", newline="\n")
+                self._file.write(text)
+                self._file.flush()
+                self.record_count += count
+                if time.monotonic() - self._last_sync >= self.FSYNC_INTERVAL:
+                    self._sync_locked()
+                elif self._sync_timer is None:
+                    self._sync_timer = threading.Timer(self.FSYNC_INTERVAL, self.sync)
+                    self._sync_timer.daemon = True
+                    self._sync_timer.start()
+            except OSError as e:
+                print(f"写入标记日志错误: {e}")
+
+    # 把已写入的记录同步到磁盘
+    def sync(self):
+        with self._lock:
+            self._sync_locked()
+
+    def _sync_locked(self):
+        if self._sync_timer is not None:
+            self._sync_timer.cancel()
+            self._sync_timer = None
+        if self._file is None:
+            return
+        try:
+            os.fsync(self._file.fileno())
+            self._last_sync = time.monotonic()
+        except OSError as e:
+            print(f"同步标记日志错误: {e}")
+
+    def _close_file(self):
+        self._sync_locked()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    # 关闭日志（退出程序前调用）
+    def close(self):
+        with self._lock:
+            self._close_file()
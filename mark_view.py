@@ -0,0 +1,45 @@
+from PyQt5.QtCore import Qt, QStringListModel
+from PyQt5.QtGui import QColor
+
+
+# 标记列表模型：每条标记一行，显示文本保存在 QStringListModel 中，标记ID保存在对应的列表中
+# 添加标记只插入新的一行；导入、切换音频时整体替换（一次模型重置）
+# 没有标记时只显示一行灰色提示（提示行没有标记ID）
+class MarkListModel(QStringListModel):
+    MarkIdRole = Qt.UserRole
+    PLACEHOLDER = "暂无标记，点击「标记当前片段」添加..."
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._mark_ids = []
+        self.set_marks([])
+
+    # 整体替换标记列表：[(mark_id, 显示文本), ...]
+    def set_marks(self, marks):
+        self._mark_ids = [mark_id for mark_id, _ in marks]
+        self.setStringList([text for _, text in marks] if marks else [self.PLACEHOLDER])
+
+    # 在末尾添加一条标记
+    def add_mark(self, mark_id, text):
+        if not self._mark_ids:
+            self.set_marks([(mark_id, text)])  # 替换提示行
+            return
+        row = len(self._mark_ids)
+        self._mark_ids.append(mark_id)
+        self.insertRows(row, 1)
+        self.setData(self.index(row), text)
+
+    # 获取某一行的标记ID，提示行返回 None
+    def mark_id(self, index):
+        row = index.row()
+        return self._mark_ids[row] if 0 <= row < len(self._mark_ids) else None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role == self.MarkIdRole:
+            return self.mark_id(index)
+        if role == Qt.ForegroundRole and not self._mark_ids:
+            return QColor(Qt.gray)  # 灰色提示文字
+        return super().data(index, role)
+
+    def flags(self, index):
+        return super().flags(index) & ~Qt.ItemIsEditable
@@ -0,0 +1,76 @@
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+
+# 进程内LRU缓存：保存最近加载的字幕时间轴和音频信息，切换曲目时无需重新读取解析
+# 每项按 (类型, 绝对路径) 存放，并用 (修改时间, 文件大小) 校验源文件是否变化；总占用按估算字节数限制
+# 后台预读线程也会读写缓存，所有操作都在锁内进行
+class MediaCache:
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes  # 内存预算
+        self.current_bytes = 0  # 当前估算占用
+        self._entries = OrderedDict()  # (kind, abs_path) -> (stamp, value, size)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    # 源文件标识：修改时间 + 文件大小（只读取文件元数据）
+    @staticmethod
+    def file_stamp(path):
+        st = os.stat(path)
+        return st.st_mtime_ns, st.st_size
+
+    # 读取缓存，不存在或源文件已变化时返回 None
+    def get(self, kind, path, stamp):
+        key = (kind, os.path.abspath(path))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != stamp:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    # 写入缓存，超出预算时淘汰最久未使用的项（单项超过预算时不缓存）
+    def put(self, kind, path, stamp, value, size):
+        key = (kind, os.path.abspath(path))
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.current_bytes -= old[2]
+            if size > self.max_bytes:
+                return
+
+            self._entries[key] = (stamp, value, size)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+
+    # 清空缓存
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    # 获取缓存统计
+    def get_stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
+    # 估算字幕数据的内存占用（纯文本 + 每条字幕的元组、两个浮点数和文本）
+    @staticmethod
+    def estimate_subtitle_size(content, timelines):
+        size = sys.getsizeof(content) + sys.getsizeof(timelines)
+        for _, _, text in timelines:
+            size += 120 + sys.getsizeof(text)
+        return size
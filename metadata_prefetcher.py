@@ -0,0 +1,58 @@
+import os
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+from subtitle_handler import SubtitleHandler
+
+
+# 单个音频文件的探测任务（在线程池中执行）
+class _ProbeTask(QRunnable):
+    def __init__(self, prefetcher, generation, audio_folder, audio_name, subtitle_folder):
+        super().__init__()
+        self.prefetcher = prefetcher
+        self.generation = generation
+        self.audio_folder = audio_folder
+        self.audio_name = audio_name
+        self.subtitle_folder = subtitle_folder
+
+    def run(self):
+        # 已切换到其他文件夹，放弃本次探测
+        if self.generation != self.prefetcher.generation:
+            return
+        try:
+            audio_path = os.path.join(self.audio_folder, self.audio_name)
+            info = dict(self.prefetcher.audio_handler.get_audio_info(audio_path))
+            info["subtitle"] = SubtitleHandler.find_matching_subtitle(self.subtitle_folder, self.audio_name)
+            if self.generation == self.prefetcher.generation:
+                self.prefetcher.file_probed.emit(self.generation, self.audio_name, info)
+        except Exception as e:
+            print(f"预读音频信息错误: {e}")
+
+
+# 后台预读音频文件夹中每个文件的时长、码率、采样率并检测同名字幕
+# 结果写入 AudioHandler 的内存缓存，之后加载同一文件时直接命中
+class MetadataPrefetcher(QObject):
+    # 信号：批次号、音频文件名、音频信息（含匹配到的字幕文件名）
+    file_probed = pyqtSignal(int, str, dict)
+
+    def __init__(self, audio_handler, max_threads=4):
+        super().__init__()
+        self.audio_handler = audio_handler
+        self.generation = 0  # 当前批次号（开始新批次或取消时递增）
+        self.pool = QThreadPool()
+        self.pool.setMaxThreadCount(max(1, min(max_threads, QThreadPool.globalInstance().maxThreadCount())))
+
+    # 开始预读（会取消尚未开始的上一批任务）
+    def start(self, audio_folder, audio_names, subtitle_folder=""):
+        self.cancel()
+        for audio_name in audio_names:
+            self.pool.start(_ProbeTask(self, self.generation, audio_folder, audio_name, subtitle_folder))
+        return self.generation
+
+    # 取消当前批次
+    def cancel(self):
+        self.generation += 1
+        self.pool.clear()
+
+    # 等待所有任务结束（退出程序前调用）
+    def shutdown(self):
+        self.cancel()
+        self.pool.waitForDone()
@@ -0,0 +1,251 @@
+import os
+import mmap
+import struct
+from array import array
+from disk_cache import DiskCache
+
+
+# 码率表（kbps）：按 (MPEG-1?, 层) 索引
+_BITRATES = {
+    (True, 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (True, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (True, 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (False, 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (False, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (False, 3): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+# 采样率表：按版本位索引（0=MPEG-2.5, 2=MPEG-2, 3=MPEG-1）
+_SAMPLE_RATES = {0: (11025, 12000, 8000), 2: (22050, 24000, 16000), 3: (44100, 48000, 32000)}
+
+
+# 解析4字节帧头，返回 (帧长度, 采样率, 每帧采样数, 声道数, 码率kbps, 格式标识)，不是有效帧头时返回 None
+def parse_frame_header(header):
+    if len(header) < 4 or header[0] != 0xFF or (header[1] & 0xE0) != 0xE0:
+        return None
+    version = (header[1] >> 3) & 3
+    layer = 4 - ((header[1] >> 1) & 3)
+    bitrate_index = header[2] >> 4
+    rate_index = (header[2] >> 2) & 3
+    if version == 1 or layer == 4 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+
+    mpeg1 = version == 3
+    bitrate = _BITRATES[(mpeg1, layer)][bitrate_index]
+    sample_rate = _SAMPLE_RATES[version][rate_index]
+    padding = (header[2] >> 1) & 1
+    if layer == 1:
+        frame_length = (12 * bitrate * 1000 // sample_rate + padding) * 4
+        samples_per_frame = 384
+    elif layer == 2 or mpeg1:
+        frame_length = 144 * bitrate * 1000 // sample_rate + padding
+        samples_per_frame = 1152
+    else:
+        frame_length = 72 * bitrate * 1000 // sample_rate + padding
+        samples_per_frame = 576
+    channels = 1 if (header[3] >> 6) == 3 else 2
+    # 同一文件内版本、层、采样率不变，用于重新同步时排除误判
+    signature = (header[1] & 0xFE, header[2] & 0x0C)
+    return frame_length, sample_rate, samples_per_frame, channels, bitrate, signature
+
+
+# 跳过文件开头的 ID3v2 标签，返回第一帧可能开始的位置
+def _skip_id3v2(data):
+    if data[:3] != b"ID3" or len(data) < 10:
+        return 0
+    size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+    footer = 10 if data[5] & 0x10 else 0
+    return 10 + size + footer
+
+
+# 读取第一帧中的 Xing/Info 或 VBRI 标签，返回 (帧数, 字节数)，没有标签时返回 None
+def _read_vbr_tag(data, offset, header):
+    mpeg1 = (header[1] >> 3) & 3 == 3
+    mono = (header[3] >> 6) == 3
+    if mpeg1:
+        side_info = 17 if mono else 32
+    else:
+        side_info = 9 if mono else 17
+
+    xing = offset + 4 + side_info
+    if data[xing:xing + 4] in (b"Xing", b"Info"):
+        flags = struct.unpack(">I", data[xing + 4:xing + 8])[0]
+        pos = xing + 8
+        frames = byte_count = 0
+        if flags & 1:
+            frames = struct.unpack(">I", data[pos:pos + 4])[0]
+            pos += 4
+        if flags & 2:
+            byte_count = struct.unpack(">I", data[pos:pos + 4])[0]
+        return frames, byte_count
+
+    vbri = offset + 4 + 32
+    if data[vbri:vbri + 4] == b"VBRI":
+        byte_count, frames = struct.unpack(">II", data[vbri + 10:vbri + 18])
+        return frames, byte_count
+    return None
+
+
+# 查找从 pos 开始的第一个有效帧（要求紧接着的下一帧也有效，避免把数据误认为帧头）
+def _find_frame(data, pos, signature=None):
+    end = len(data) - 4
+    while pos <= end:
+        pos = data.find(b"\xFF", pos)
+        if pos < 0 or pos > end:
+            return -1, None
+        frame = parse_frame_header(data[pos:pos + 4])
+        if frame is not None and (signature is None or frame[5] == signature):
+            next_frame = parse_frame_header(data[pos + frame[0]:pos + frame[0] + 4])
+            if next_frame is not None and next_frame[5] == frame[5]:
+                return pos, frame
+            if pos + frame[0] == len(data):
+                return pos, frame
+        pos += 1
+    return -1, None
+
+
+# 只读取文件开头获取MP3信息：有 Xing/VBRI 标签时时长精确，否则按首帧码率估算
+def probe_mp3(audio_path):
+    with open(audio_path, "rb") as f:
+        file_size = os.fstat(f.fileno()).st_size
+        head = f.read(10)
+        start = _skip_id3v2(head)
+        f.seek(start)
+        data = f.read(64 * 1024)
+
+    pos, frame = _find_frame(data, 0)
+    if frame is None:
+        raise ValueError("找不到MP3帧")
+    _, sample_rate, samples_per_frame, channels, bitrate, _ = frame
+    tag = _read_vbr_tag(data, pos, data[pos:pos + 4])
+    if tag is not None and tag[0] > 0:
+        duration = tag[0] * samples_per_frame / sample_rate
+        if tag[1] > 0 and duration > 0:
+            bitrate = tag[1] * 8 / duration / 1000
+    else:
+        duration = (file_size - start - pos) * 8 / (bitrate * 1000)
+
+    return {
+        "duration": duration,
+        "sample_rate": sample_rate,
+        "channels": channels,
+        "bitrate": int(bitrate * 1000)
+    }
+
+
+# MP3帧索引：记录每一帧的字节偏移，跳转时直接换算出目标帧
+class Mp3FrameIndex:
+    def __init__(self, sample_rate, samples_per_frame, offsets):
+        self.sample_rate = sample_rate
+        self.samples_per_frame = samples_per_frame
+        self.offsets = offsets  # array("Q")：每一帧的字节偏移（不含 Xing/VBRI 标签帧）
+        self.frame_duration = samples_per_frame / sample_rate
+        self.duration = len(offsets) * self.frame_duration  # 按实际帧数计算的总时长
+
+    # 返回包含指定时间的帧：(字节偏移, 帧开始时间)
+    def locate(self, position_sec):
+        if not self.offsets:
+            return 0, 0
+        frame = min(max(int(position_sec / self.frame_duration), 0), len(self.offsets) - 1)
+        return self.offsets[frame], frame * self.frame_duration
+
+    # 扫描整个文件的帧头建立索引（每帧只读取4字节帧头，不解码音频）
+    @classmethod
+    def build(cls, audio_path):
+        with open(audio_path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                raise ValueError("文件为空")
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                pos, frame = _find_frame(data, _skip_id3v2(data[:10]))
+                if frame is None:
+                    raise ValueError("找不到MP3帧")
+                sample_rate, samples_per_frame, signature = frame[1], frame[2], frame[5]
+
+                offsets = array("Q")
+                # 首帧为 Xing/VBRI 标签帧时不包含音频，不计入索引
+                if _read_vbr_tag(data, pos, data[pos:pos + 4]) is not None:
+                    pos += frame[0]
+                end = len(data) - 4
+                while pos <= end:
+                    frame = parse_frame_header(data[pos:pos + 4])
+                    if frame is None or frame[5] != signature:
+                        # 帧数据损坏或遇到尾部标签，重新同步
+                        pos, frame = _find_frame(data, pos + 1, signature)
+                        if frame is None:
+                            break
+                    offsets.append(pos)
+                    pos += frame[0]
+        return cls(sample_rate, samples_per_frame, offsets)
+
+
+# MP3帧索引的磁盘缓存（按 绝对路径 + 修改时间 + 文件大小 校验，与其他磁盘缓存共用大小上限，超限时按最近使用淘汰）
+# 缓存文件格式：文件头 | 源文件路径 | 帧偏移数组
+class Mp3IndexCache:
+    MAGIC = b"LTMI"
+    VERSION = 1
+    HEADER = struct.Struct("<4sHqqIIII")  # magic, version, mtime_ns, size, sample_rate, samples_per_frame, frame_count, path_len
+
+    def __init__(self, cache_dir, max_bytes=128 * 1024 * 1024):
+        self.disk = DiskCache(cache_dir, max_bytes)
+
+    # 读取缓存，源文件已变化或缓存损坏时返回 None
+    def get(self, audio_path, stat):
+        abs_path = os.path.abspath(audio_path)
+        data = self.disk.read(abs_path)
+        if data is None:
+            return None
+        try:
+            magic, version, mtime_ns, size, sample_rate, samples_per_frame, count, path_len = \
+                self.HEADER.unpack_from(data, 0)
+            offset = self.HEADER.size
+            if (magic != self.MAGIC or version != self.VERSION or
+                    mtime_ns != stat.st_mtime_ns or size != stat.st_size):
+                return None
+            if data[offset:offset + path_len].decode("utf-8") != abs_path:
+                return None
+            offset += path_len
+
+            offsets = array("Q")
+            offsets.frombytes(data[offset:offset + count * 8])
+            if len(offsets) != count or sample_rate <= 0:
+                return None
+        except (ValueError, struct.error):
+            return None
+        self.disk.touch(abs_path)
+        return Mp3FrameIndex(sample_rate, samples_per_frame, offsets)
+
+    # 写入缓存
+    def put(self, audio_path, stat, index):
+        abs_path = os.path.abspath(audio_path)
+        path_bytes = abs_path.encode("utf-8")
+        parts = [
+            self.HEADER.pack(self.MAGIC, self.VERSION, stat.st_mtime_ns, stat.st_size, index.sample_rate,
+                             index.samples_per_frame, len(index.offsets), len(path_bytes)),
+            path_bytes,
+            index.offsets.tobytes(),
+        ]
+        try:
+            self.disk.write(abs_path, parts)
+        except OSError as e:
+            print(f"写入MP3索引缓存错误: {e}")
+
+
+# 从指定字节偏移开始的只读文件视图，交给 pygame.mixer.music.load 从目标帧开始解码
+class OffsetFile:
+    def __init__(self, audio_path, offset):
+        self._file = open(audio_path, "rb")
+        self._offset = offset
+        self._file.seek(offset)
+
+    def read(self, size=-1):
+        return self._file.read(size)
+
+    def seek(self, position, whence=0):
+        if whence == 0:
+            position += self._offset
+        return self._file.seek(position, whence) - self._offset
+
+    def tell(self):
+        return self._file.tell() - self._offset
+
+    def close(self):
+        self._file.close()
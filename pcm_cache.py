@@ -0,0 +1,53 @@
+from collections import OrderedDict
+
+
+# 解码后PCM数据的块缓存：按固定帧数分块，总大小超过内存预算时淘汰最久未使用的块
+# 只在流式播放器的后台线程中访问（持有播放器的锁），不需要单独加锁
+class PcmBlockCache:
+    def __init__(self, max_bytes=128 * 1024 * 1024, block_frames=65536):
+        self.max_bytes = max_bytes  # 内存预算
+        self.block_frames = block_frames  # 每块的文件帧数（44.1kHz 时约 1.5 秒）
+        self.current_bytes = 0
+        self._blocks = OrderedDict()  # (source_key, block_index) -> ndarray
+        self.hits = 0
+        self.misses = 0
+
+    # 读取缓存块，不存在时返回 None
+    def get(self, source_key, block_index):
+        key = (source_key, block_index)
+        block = self._blocks.get(key)
+        if block is None:
+            self.misses += 1
+            return None
+        self._blocks.move_to_end(key)
+        self.hits += 1
+        return block
+
+    # 是否已缓存（不影响使用顺序和统计）
+    def contains(self, source_key, block_index):
+        return (source_key, block_index) in self._blocks
+
+    # 写入缓存块
+    def put(self, source_key, block_index, block):
+        key = (source_key, block_index)
+        old = self._blocks.pop(key, None)
+        if old is not None:
+            self.current_bytes -= old.nbytes
+        if block.nbytes > self.max_bytes:
+            return
+
+        self._blocks[key] = block
+        self.current_bytes += block.nbytes
+        while self.current_bytes > self.max_bytes:
+            _, evicted = self._blocks.popitem(last=False)
+            self.current_bytes -= evicted.nbytes
+
+    # 获取缓存统计
+    def get_stats(self):
+        return {
+            "blocks": len(self._blocks),
+            "bytes": self.current_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses
+        }
@@ -0,0 +1,77 @@
+import threading
+import time
+
+
+# 播放时钟：以输出设备实际消耗的采样换算出的媒体位置为准，两次确认之间用单调时钟插值
+# 插值按倍速推进，且最多外推 max_extrapolation 秒（输出卡顿时不会跑到实际播放位置前面）
+class PlaybackClock:
+    def __init__(self, max_extrapolation=0.25):
+        self.max_extrapolation = max_extrapolation
+        self._lock = threading.Lock()
+        self._running = False
+        self._rate = 1.0  # 每秒输出对应的媒体秒数（即播放倍速）
+        self._sync_position = 0.0  # 最近一次确认的媒体位置
+        self._sync_time = 0.0  # 最近一次确认时的单调时钟
+        self._last_position = 0.0  # 上次返回的位置（播放中保证不回退）
+        self._start_position = 0.0  # 开始播放时的媒体位置
+        self._start_time = 0.0  # 开始播放时的单调时钟
+        # 漂移统计：插值结果与随后确认的实际位置之差
+        self._drift_count = 0
+        self._drift_abs_sum = 0.0
+        self._drift_max = 0.0
+        self._wall_clock_drift = 0.0  # 按墙上时钟推算的位置与实际位置之差（旧算法的误差）
+
+    # 开始播放（或跳转后重新开始）：媒体位置已知
+    def start(self, media_pos, rate=1.0):
+        with self._lock:
+            now = time.monotonic()
+            self._running = True
+            self._rate = rate
+            self._sync_position = self._last_position = self._start_position = media_pos
+            self._sync_time = self._start_time = now
+
+    # 暂停或停止：位置冻结
+    def pause(self, media_pos):
+        with self._lock:
+            self._running = False
+            self._sync_position = self._last_position = media_pos
+
+    # 输出设备确认已播放到 media_pos（由实际消耗的采样换算），rate 为之后的插值速度
+    def sync(self, media_pos, rate=None):
+        with self._lock:
+            if not self._running:
+                return
+            now = time.monotonic()
+            error = self._interpolate(now) - media_pos
+            self._drift_count += 1
+            self._drift_abs_sum += abs(error)
+            self._drift_max = max(self._drift_max, abs(error))
+            self._wall_clock_drift = self._start_position + (now - self._start_time) - media_pos
+
+            self._sync_position = media_pos
+            self._sync_time = now
+            if rate is not None:
+                self._rate = rate
+
+    # 当前媒体位置（秒）
+    def position(self):
+        with self._lock:
+            if not self._running:
+                return self._last_position
+            self._last_position = max(self._last_position, self._interpolate(time.monotonic()))
+            return self._last_position
+
+    # 从最近一次确认位置插值
+    def _interpolate(self, now):
+        elapsed = min(now - self._sync_time, self.max_extrapolation)
+        return self._sync_position + elapsed * self._rate
+
+    # 获取漂移统计（毫秒）
+    def get_stats(self):
+        with self._lock:
+            return {
+                "syncs": self._drift_count,
+                "drift_avg_ms": self._drift_abs_sum / self._drift_count * 1000 if self._drift_count else 0.0,
+                "drift_max_ms": self._drift_max * 1000,
+                "wall_clock_drift_ms": self._wall_clock_drift * 1000
+            }
@@ -0,0 +1,119 @@
+import math
+import time
+from PyQt5.QtCore import QObject, QTimer, Qt
+
+
+# 播放界面刷新调度（代替固定50ms轮询）
+# 暂停或空闲时不运行任何定时器；播放中在下一个字幕边界、循环片段终点或音频结尾精确唤醒刷新字幕，
+# 进度文字按较低的固定频率单独刷新
+class PlaybackScheduler(QObject):
+    LABEL_INTERVAL = 250  # 进度文字刷新间隔（毫秒）
+    MIN_DELAY = 10  # 最短唤醒间隔（毫秒）：时钟还没走到目标位置时稍后重试，避免连续唤醒
+    BOUNDARY_MARGIN = 0.002  # 在边界之后稍晚唤醒（秒），保证新句子已经开始
+
+    # on_event：到达事件时刷新进度和字幕；on_label：只刷新进度文字
+    def __init__(self, audio_handler, subtitle_handler, on_event, on_label, parent=None):
+        super().__init__(parent)
+        self.audio_handler = audio_handler
+        self.subtitle_handler = subtitle_handler
+        self.on_event = on_event
+        self.on_label = on_label
+
+        self.event_timer = QTimer(self)
+        self.event_timer.setSingleShot(True)
+        self.event_timer.setTimerType(Qt.PreciseTimer)
+        self.event_timer.timeout.connect(self._on_event_timer)
+        self.label_timer = QTimer(self)
+        self.label_timer.setInterval(self.LABEL_INTERVAL)
+        self.label_timer.timeout.connect(self._on_label_timer)
+
+        # 统计：唤醒次数与每次回调耗时（只在播放中计时）
+        self.event_ticks = 0
+        self.label_ticks = 0
+        self._tick_time_sum = 0.0
+        self._tick_time_max = 0.0
+        self._active_since = None  # 开始播放的单调时钟
+        self._active_total = 0.0  # 累计播放时长
+
+    # 播放状态、位置、倍速、循环区间或字幕变化后调用：重新计算下一次唤醒时间
+    def wake(self):
+        if not self.audio_handler.is_playing:
+            self.event_timer.stop()
+            self.label_timer.stop()
+            self._set_active(False)
+            return
+
+        self._set_active(True)
+        if not self.label_timer.isActive():
+            self.label_timer.start()
+
+        position = self.audio_handler.current_progress
+        next_time = self._next_event_time(position)
+        if next_time is None:
+            self.event_timer.stop()
+            return
+        speed = max(self.audio_handler.playback_speed, 0.01)
+        delay = math.ceil((next_time + self.BOUNDARY_MARGIN - position) / speed * 1000)
+        self.event_timer.start(max(delay, self.MIN_DELAY))
+
+    # 下一个需要刷新字幕的媒体时间：字幕边界、循环片段终点、音频结尾中最早的一个
+    def _next_event_time(self, position):
+        candidates = []
+        if not self.subtitle_handler.is_hidden:
+            boundary = self.subtitle_handler.next_cue_boundary(position)
+            if boundary is not None:
+                candidates.append(boundary)
+        loop_range = self.audio_handler.loop_range
+        if loop_range is not None:
+            # 已到达终点但播放器尚未停止时，稍后重试
+            candidates.append(max(loop_range[1], position))
+        if self.audio_handler.total_duration > 0:
+            candidates.append(max(self.audio_handler.total_duration, position))
+        return min(candidates) if candidates else None
+
+    def _on_event_timer(self):
+        self.event_ticks += 1
+        self._run_tick(self.on_event)
+        self.wake()
+
+    def _on_label_timer(self):
+        self.label_ticks += 1
+        self._run_tick(self.on_label)
+        if not self.audio_handler.is_playing:
+            self.wake()
+
+    def _run_tick(self, callback):
+        started = time.perf_counter()
+        callback()
+        elapsed = time.perf_counter() - started
+        self._tick_time_sum += elapsed
+        self._tick_time_max = max(self._tick_time_max, elapsed)
+
+    # 记录播放中的时长（用于计算唤醒频率）
+    def _set_active(self, active):
+        now = time.monotonic()
+        if active and self._active_since is None:
+            self._active_since = now
+        elif not active and self._active_since is not None:
+            self._active_total += now - self._active_since
+            self._active_since = None
+
+    # 停止所有定时器（退出程序前调用）
+    def stop(self):
+        self.event_timer.stop()
+        self.label_timer.stop()
+        self._set_active(False)
+
+    # 获取调度统计：唤醒频率（次/秒，按播放时长计算）与每次回调的耗时（毫秒）
+    def get_stats(self):
+        active = self._active_total
+        if self._active_since is not None:
+            active += time.monotonic() - self._active_since
+        ticks = self.event_ticks + self.label_ticks
+        return {
+            "event_ticks": self.event_ticks,
+            "label_ticks": self.label_ticks,
+            "ticks_per_sec": ticks / active if active > 0 else 0.0,
+            "tick_avg_ms": self._tick_time_sum / ticks * 1000 if ticks else 0.0,
+            "tick_max_ms": self._tick_time_max * 1000
+        }
@@ -0,0 +1,425 @@
+import os
+import threading
+import time
+from collections import deque
+import pygame
+
+# 可选依赖：缺少 numpy / soundfile 时 AudioHandler 退回 pygame.mixer.music 播放
+try:
+    import numpy as np
+    import soundfile as sf
+    from time_stretch import WsolaStretcher
+    from pcm_cache import PcmBlockCache
+except ImportError:
+    np = None
+    sf = None
+
+
+# 解码后的音频源：按输出采样率线性插值重采样，并转换为输出声道数
+# 解码结果按块保存在 PcmBlockCache 中，跳转到已缓存的区域时不需要重新解码
+# 设置A-B循环后，读取到循环终点时直接接上循环起点的采样（或在最后一遍结束时停止读取）
+class PcmSource:
+    def __init__(self, audio_path, out_rate, out_channels, block_cache):
+        self._file = sf.SoundFile(audio_path)
+        self.block_cache = block_cache
+        st = os.stat(audio_path)
+        self.cache_key = (os.path.abspath(audio_path), st.st_mtime_ns, st.st_size, out_channels)
+        self.file_rate = self._file.samplerate
+        self.frames = self._file.frames
+        self.duration = self.frames / self.file_rate if self.file_rate else 0
+        self.out_rate = out_rate
+        self.out_channels = out_channels
+        self.ratio = self.file_rate / out_rate  # 每个输出帧前进的文件帧数
+        self._loop = None  # A-B循环：(起点文件帧, 终点文件帧, 总播放次数)，次数为 None 表示无限循环
+        self.start(0)
+
+    # 从指定位置（秒）开始读取
+    def start(self, position_sec):
+        self._pos = position_sec * self.file_rate  # 下一个输出帧对应的文件帧位置（小数）
+        self._out_count = 0  # 已读取的输出帧数
+        self._segments = deque([(0, self._pos)])  # 连续读取的区段：(开始的输出帧号, 对应的文件帧位置)
+        self._loop_left = None if self._loop is None or self._loop[2] is None else self._loop[2] - 1
+        self.loop_finished = False  # 是否已在循环终点停止读取
+
+    # 设置A-B循环（秒），repeats 为总播放次数（None 表示无限循环）；start_sec 为 None 时取消循环
+    def set_loop(self, start_sec, end_sec=None, repeats=None):
+        self.loop_finished = False
+        if start_sec is None:
+            self._loop = None
+            self._loop_left = None
+            return
+        loop_start = int(round(start_sec * self.file_rate))
+        loop_end = min(int(round(end_sec * self.file_rate)), self.frames)
+        self._loop = (loop_start, loop_end, repeats) if loop_end - loop_start > self.ratio else None
+        self._loop_left = None if self._loop is None or repeats is None else repeats - 1
+
+    # 输出帧号 → 媒体时间（秒），调用时输出帧号不减小
+    def media_time(self, out_index):
+        while len(self._segments) > 1 and self._segments[1][0] <= out_index:
+            self._segments.popleft()
+        out_start, file_pos = self._segments[0]
+        return (file_pos + (out_index - out_start) * self.ratio) / self.file_rate
+
+    # 当前读取位置（秒）
+    def position(self):
+        return min(self._pos / self.file_rate, self.duration)
+
+    # 读取最多 n 个输出帧，文件结束（或循环的最后一遍结束）时返回不足 n 帧
+    def read(self, n):
+        parts = []
+        while n > 0:
+            data = self._read_until(n, self._read_limit())
+            parts.append(data)
+            n -= len(data)
+            if n > 0 and not self._wrap_loop():
+                break
+        return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+    # 本次连续读取的终点（文件帧）：读取位置在循环区间之前或之中（或最后一遍已结束）时为循环终点
+    def _read_limit(self):
+        if self._loop is not None and (self._pos < self._loop[1] or self.loop_finished):
+            return self._loop[1]
+        return self.frames
+
+    # 读取到循环终点后回到循环起点（保留小数相位，两遍之间不插入也不丢弃采样）
+    # 不在循环终点或次数已用完时返回 False
+    def _wrap_loop(self):
+        if self._loop is None or not self._loop[1] - 1 < self._pos <= self._loop[1] - 1 + self.ratio:
+            return False
+        loop_start, loop_end, _ = self._loop
+        if self._loop_left == 0:
+            self.loop_finished = True
+            return False
+        if self._loop_left is not None:
+            self._loop_left -= 1
+        self._pos = loop_start + max(self._pos - loop_end, 0)
+        self._segments.append((self._out_count, self._pos))
+        return True
+
+    # 连续读取最多 n 个输出帧，不超过文件帧 limit
+    def _read_until(self, n, limit):
+        count = int(max(0, min(n, (limit - 1 - self._pos) // self.ratio + 1)))
+        if count == 0:
+            return np.zeros((0, self.out_channels), dtype=np.float32)
+
+        positions = self._pos + np.arange(count) * self.ratio
+        index = positions.astype(np.int64)
+        first = int(index[0])
+        data = self._decode(first, min(int(index[-1]) + 2, self.frames))
+        if int(index[-1]) - first >= len(data):
+            # 实际可解码的帧数少于文件头记录的帧数
+            self.frames = first + len(data)
+            count = int(np.count_nonzero(index - first < len(data)))
+            positions, index = positions[:count], index[:count]
+            if count == 0:
+                return np.zeros((0, self.out_channels), dtype=np.float32)
+        self._pos += count * self.ratio
+        self._out_count += count
+
+        a = data[index - first]
+        if self.ratio == 1.0 and positions[0] == first:
+            return a
+        b = data[np.minimum(index + 1 - first, len(data) - 1)]
+        frac = (positions - index).astype(np.float32)[:, None]
+        return a + (b - a) * frac
+
+    # 解码文件帧 [start, end)，按块从缓存读取，未缓存的块解码后写入缓存
+    def _decode(self, start, end):
+        block_frames = self.block_cache.block_frames
+        first_block = start // block_frames
+        last_block = (end - 1) // block_frames
+        blocks = [self._get_block(i) for i in range(first_block, last_block + 1)]
+        data = blocks[0] if len(blocks) == 1 else np.concatenate(blocks)
+        offset = start - first_block * block_frames
+        return data[offset:offset + end - start]
+
+    # 读取一个块，未缓存时解码后写入缓存
+    def _get_block(self, block_index):
+        block = self.block_cache.get(self.cache_key, block_index)
+        if block is None:
+            block = self._decode_block(block_index)
+            self.block_cache.put(self.cache_key, block_index, block)
+        return block
+
+    # 从文件解码一个块（文件末尾的块可能不足 block_frames 帧）
+    def _decode_block(self, block_index):
+        block_start = block_index * self.block_cache.block_frames
+        if self._file.tell() != block_start:
+            self._file.seek(block_start)
+        data = self._file.read(self.block_cache.block_frames, dtype="float32", always_2d=True)
+        return self._map_channels(data)
+
+    # 预先解码一个块，已缓存或超出文件范围时返回 False
+    def prefetch_block(self, block_index):
+        if block_index < 0 or block_index * self.block_cache.block_frames >= self.frames:
+            return False
+        if self.block_cache.contains(self.cache_key, block_index):
+            return False
+        self.block_cache.put(self.cache_key, block_index, self._decode_block(block_index))
+        return True
+
+    # 媒体时间（秒）所在的块号
+    def block_at(self, position_sec):
+        return int(position_sec * self.file_rate) // self.block_cache.block_frames
+
+    # 下一个输出帧所在的块号
+    def current_block(self):
+        return int(self._pos) // self.block_cache.block_frames
+
+    # 转换为输出声道数（单声道复制到各声道，多声道取前几个声道）
+    def _map_channels(self, data):
+        channels = data.shape[1]
+        if channels == self.out_channels:
+            return data
+        if channels == 1:
+            return np.repeat(data, self.out_channels, axis=1)
+        if self.out_channels == 1:
+            return data.mean(axis=1, keepdims=True)
+        return data[:, :self.out_channels]
+
+    def close(self):
+        self._file.close()
+
+
+# 持续输出的流式播放器：后台线程解码 → WSOLA 变速 → 逐块排队到专用的 pygame 混音通道
+# 倍速变化从下一个渲染的块开始生效，不需要重新初始化混音器；
+# 每个块开始播放时用它对应的媒体位置校准播放时钟
+# 输出队列已满或暂停时，后台线程利用空闲时间预先解码播放位置前后和各标记片段所在的块
+class StreamPlayer:
+    CHUNK_HOPS = 8  # 每个输出块包含的合成步数（44.1kHz 时约 93ms）
+    POLL_INTERVAL = 0.005  # 后台线程检查输出通道的间隔（秒）
+    MAX_RANGE_BLOCKS = 4  # 每个标记片段最多预读的块数
+    PREFETCH_CACHE_FRACTION = 0.5  # 标记片段预读最多占用的缓存比例（其余留给播放位置附近的块）
+
+    def __init__(self, clock, pcm_cache_bytes=128 * 1024 * 1024):
+        self.clock = clock
+        self.block_cache = PcmBlockCache(pcm_cache_bytes)
+        self._prefetch_blocks = deque()  # 等待预读的块号（标记片段所在位置）
+        self.speed = 1.0
+        self.finished = False  # 是否已播放到文件末尾（或循环的最后一遍结束）
+        self.loop_finished = False  # 是否因循环次数用完而结束
+        self.duration = 0
+        self._source = None
+        self._stretcher = None
+        self._playing = False
+        self._source_done = False
+        self._chunks = deque()  # 已交给混音通道的块：(Sound, 媒体开始位置, 倍速)
+        self._synced_chunk = None  # 最近一次用于校准时钟的块
+        self._closed = False
+        self._cond = threading.Condition(threading.RLock())
+        self.native_rate = pygame.mixer.get_init()[0]  # 混音器原始输出频率（流式播放始终使用该频率）
+        self._init_output()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    # 依赖是否可用、混音器格式是否支持
+    @staticmethod
+    def is_available():
+        mixer_init = pygame.mixer.get_init()
+        return np is not None and mixer_init is not None and mixer_init[1] in (-16, 32)
+
+    # 读取混音器输出格式，并保留一个通道专用于流式输出
+    def _init_output(self):
+        self.out_rate, self.out_format, self.out_channels = pygame.mixer.get_init()
+        pygame.mixer.set_reserved(1)
+        self.channel = pygame.mixer.Channel(0)
+
+    # 按指定频率重新初始化混音器（pygame 播放时通过频率变速），在锁内进行，避免后台线程同时访问通道
+    def reinit_mixer(self, frequency):
+        with self._cond:
+            if pygame.mixer.get_init()[0] == frequency:
+                return
+            self._stop_locked()
+            pygame.mixer.quit()
+            pygame.mixer.init(frequency=frequency)
+            self._init_output()
+
+    # 打开音频文件，返回时长（秒）；格式不支持时抛出异常
+    def open(self, audio_path):
+        with self._cond:
+            self._stop_locked()
+            self._close_source()
+            # pygame 播放可能按倍速改变了混音器频率，恢复为原始输出频率
+            self.reinit_mixer(self.native_rate)
+            self._source = PcmSource(audio_path, self.out_rate, self.out_channels, self.block_cache)
+            self._prefetch_blocks.clear()
+            self._stretcher = WsolaStretcher(self.out_channels, self.out_rate)
+            self.duration = self._source.duration
+            self.finished = False
+            return self.duration
+
+    # 从指定位置开始播放
+    def play(self, position):
+        with self._cond:
+            if self._source is None:
+                return
+            self._stop_locked()
+            self._source.start(position)
+            self._stretcher.reset()
+            self._stretcher.speed = self.speed
+            self._source_done = False
+            self.finished = False
+            self.loop_finished = False
+            self._playing = True
+            self.clock.start(position, self.speed)
+            self._cond.notify_all()
+
+    # 停止输出（位置由调用方记录）
+    def stop(self):
+        with self._cond:
+            self._stop_locked()
+
+    # 设置需要预读的时间范围（秒）：[(start_sec, end_sec), ...]，通常为当前音频的标记片段
+    def set_prefetch_ranges(self, ranges):
+        with self._cond:
+            self._prefetch_blocks.clear()
+            self._queue_prefetch(ranges)
+
+    # 追加需要预读的时间范围（新添加的标记片段），不影响已排队的块
+    def add_prefetch_ranges(self, ranges):
+        with self._cond:
+            self._queue_prefetch(ranges)
+
+    # 把时间范围所在的块加入预读队列：离播放位置近的块优先，总数不超过缓存预算的 PREFETCH_CACHE_FRACTION
+    # （超出预算时预读的块会互相淘汰，每次都要重新解码）
+    def _queue_prefetch(self, ranges):
+        if self._source is None:
+            return
+        blocks = set(self._prefetch_blocks)
+        for start_sec, end_sec in ranges:
+            first = self._source.block_at(start_sec)
+            last = min(self._source.block_at(end_sec), first + self.MAX_RANGE_BLOCKS - 1)
+            blocks.update(range(first, last + 1))
+        current = self._source.block_at(self.clock.position())
+        block_bytes = self.block_cache.block_frames * self.out_channels * 4  # float32
+        limit = max(1, int(self.block_cache.max_bytes * self.PREFETCH_CACHE_FRACTION) // block_bytes)
+        self._prefetch_blocks = deque(sorted(blocks, key=lambda i: abs(i - current))[:limit])
+        self._cond.notify_all()
+
+    # 设置A-B循环（秒）：repeats 为总播放次数，None 表示无限循环；从下一段读取的输入开始生效
+    def set_loop(self, start_sec, end_sec, repeats=None):
+        with self._cond:
+            if self._source is not None:
+                self._source.set_loop(start_sec, end_sec, repeats)
+
+    # 取消A-B循环
+    def clear_loop(self):
+        with self._cond:
+            if self._source is not None:
+                self._source.set_loop(None)
+
+    # 设置倍速（从下一个渲染的块开始生效）
+    def set_speed(self, speed):
+        with self._cond:
+            self.speed = speed
+
+    # 关闭播放器（退出程序前调用）
+    def close(self):
+        with self._cond:
+            self._stop_locked()
+            self._close_source()
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout=1)
+
+    def _stop_locked(self):
+        self._playing = False
+        self.channel.stop()
+        self._chunks.clear()
+        self._synced_chunk = None
+
+    def _close_source(self):
+        if self._source is not None:
+            self._source.close()
+            self._source = None
+
+    # 后台线程：保持通道中有正在播放和排队的块
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._closed and not self._playing and not self._prefetch_blocks:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                try:
+                    if self._playing:
+                        self._pump()
+                    else:
+                        self._prefetch_step(False)
+                except Exception as e:
+                    print(f"流式播放错误: {e}")
+                    self._stop_locked()
+                    self._prefetch_blocks.clear()
+            time.sleep(self.POLL_INTERVAL)
+
+    # 空闲时预读一个块：播放中优先播放位置后面两块和前面一块，其次是标记片段
+    def _prefetch_step(self, playing):
+        if self._source is None:
+            self._prefetch_blocks.clear()
+            return
+        if playing:
+            current = self._source.current_block()
+            for block_index in (current + 1, current + 2, current - 1):
+                if self._source.prefetch_block(block_index):
+                    return
+        while self._prefetch_blocks:
+            if self._source.prefetch_block(self._prefetch_blocks.popleft()):
+                return
+
+    def _pump(self):
+        # 移除已经播放完的块；新开始播放的块用于校准时钟
+        current = self.channel.get_sound()
+        while self._chunks and self._chunks[0][0] is not current:
+            self._chunks.popleft()
+        if self._chunks and self._chunks[0] is not self._synced_chunk:
+            previous = self._synced_chunk
+            self._synced_chunk = self._chunks[0]
+            if previous is not None and self._synced_chunk[1] < previous[1]:
+                # 循环回到起点：媒体位置不连续，重新开始计时
+                self.clock.start(self._synced_chunk[1], self._synced_chunk[2])
+            else:
+                self.clock.sync(self._synced_chunk[1], self._synced_chunk[2])
+
+        if not self._chunks and self._source_done:
+            # 全部播放完毕
+            self._playing = False
+            self.finished = True
+            self.loop_finished = self._source.loop_finished
+            self.clock.pause(self._source.position() if self.loop_finished else self.duration)
+            return
+
+        if len(self._chunks) < 2 and not self._source_done:
+            chunk = self._render_chunk()
+            if chunk is None:
+                self._source_done = True
+                return
+            if self.channel.get_busy():
+                self.channel.queue(chunk[0])
+            else:
+                self.channel.play(chunk[0])
+            self._chunks.append(chunk)
+        else:
+            self._prefetch_step(True)
+
+    # 渲染一个输出块，返回 (Sound, 媒体开始位置, 倍速)；没有更多数据时返回 None
+    def _render_chunk(self):
+        speed = self.speed
+        self._stretcher.speed = speed
+        media_start = self._source.media_time(self._stretcher.position)
+        hops = []
+        for _ in range(self.CHUNK_HOPS):
+            hop = self._stretcher.synthesize_hop(self._source)
+            if hop is None:
+                break
+            hops.append(hop)
+        if not hops:
+            return None
+
+        samples = np.concatenate(hops)
+        if self.out_format == -16:
+            pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype(np.int16)
+        else:
+            pcm = samples.astype(np.float32)
+        if self.out_channels == 1:
+            pcm = pcm[:, 0]
+        return pygame.mixer.Sound(buffer=pcm.tobytes()), media_start, speed
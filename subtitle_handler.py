@@ -1,13 +1,102 @@
 import os
-import re
+import heapq
+import struct
+from array import array
+from bisect import bisect_left, bisect_right
+from disk_cache import DiskCache
+
+
+# 已解析字幕的磁盘缓存（按 绝对路径 + 修改时间 + 文件大小 校验，与其他磁盘缓存共用大小上限，超限时按最近使用淘汰）
+# 缓存文件格式：文件头 | 源文件路径 | 开始时间数组 | 结束时间数组 | 文本长度数组 | UTF-8文本
+class SubtitleCache:
+    MAGIC = b"LTSC"
+    VERSION = 1
+    HEADER = struct.Struct("<4sHqqII")  # magic, version, mtime_ns, size, cue_count, path_len
+
+    def __init__(self, cache_dir, max_bytes=128 * 1024 * 1024):
+        self.disk = DiskCache(cache_dir, max_bytes)
+
+    # 读取缓存，源文件已变化或缓存损坏时返回 None
+    def get(self, subtitle_path, stat):
+        abs_path = os.path.abspath(subtitle_path)
+        data = self.disk.read(abs_path)
+        if data is None:
+            return None
+        try:
+            magic, version, mtime_ns, size, count, path_len = self.HEADER.unpack_from(data, 0)
+            offset = self.HEADER.size
+            if (magic != self.MAGIC or version != self.VERSION or
+                    mtime_ns != stat.st_mtime_ns or size != stat.st_size):
+                return None
+            if data[offset:offset + path_len].decode("utf-8") != abs_path:
+                return None
+            offset += path_len
+
+            starts = array("d")
+            ends = array("d")
+            lengths = array("I")
+            starts.frombytes(data[offset:offset + count * 8])
+            offset += count * 8
+            ends.frombytes(data[offset:offset + count * 8])
+            offset += count * 8
+            lengths.frombytes(data[offset:offset + count * 4])
+            offset += count * 4
+
+            timelines = []
+            for start_sec, end_sec, length in zip(starts, ends, lengths):
+                timelines.append((start_sec, end_sec, data[offset:offset + length].decode("utf-8")))
+                offset += length
+            if len(timelines) != count:
+                return None
+        except (ValueError, struct.error):
+            return None
+        self.disk.touch(abs_path)
+        return timelines
+
+    # 写入缓存（写入失败不影响字幕加载）
+    def put(self, subtitle_path, stat, timelines):
+        abs_path = os.path.abspath(subtitle_path)
+        path_bytes = abs_path.encode("utf-8")
+        texts = [text.encode("utf-8") for _, _, text in timelines]
+        parts = [
+            self.HEADER.pack(self.MAGIC, self.VERSION, stat.st_mtime_ns, stat.st_size, len(timelines), len(path_bytes)),
+            path_bytes,
+            array("d", (start_sec for start_sec, _, _ in timelines)).tobytes(),
+            array("d", (end_sec for _, end_sec, _ in timelines)).tobytes(),
+            array("I", (len(text) for text in texts)).tobytes(),
+        ]
+        parts.extend(texts)
+
+        try:
+            self.disk.write(abs_path, parts)
+        except OSError as e:
+            print(f"写入字幕缓存错误: {e}")
 
 
 class SubtitleHandler:
-    def __init__(self):
+    def __init__(self, cache_dir=os.path.join("cache", "subtitles"), memory_cache=None):
+        self.subtitle_cache = SubtitleCache(cache_dir) if cache_dir else None  # 已解析字幕的磁盘缓存
+        self.memory_cache = memory_cache  # 进程内LRU缓存（MediaCache，可选）
         self.current_subtitle_path = ""  # 当前字幕路径
         self.subtitle_content = ""  # 字幕纯文本内容
         self.subtitle_timelines = []  # 字幕时间轴列表：[(start_sec, end_sec, text), ...]
         self.is_hidden = False  # 字幕隐藏状态
+        # 按开始时间排序的字幕索引（并行数组，供二分查找）
+        self._indexed_timelines = None  # 建立索引时对应的时间轴列表
+        self._index_starts = []  # 排序后的开始时间
+        self._index_ends = []  # 对应的结束时间
+        self._index_order = []  # 对应字幕在 subtitle_timelines 中的下标
+        # 所有开始/结束时间把时间轴分成若干区段，预先求出每个区段应显示的字幕（用于处理重叠字幕）
+        self._segment_points = []  # 排序去重后的开始/结束时间
+        self._point_cues = []  # 恰好在 _segment_points[k] 时刻的字幕下标（没有时为 -1）
+        self._gap_cues = []  # 在 (_segment_points[k], _segment_points[k + 1]) 之间的字幕下标
+        self._index_sorted_ends = []  # 排序后的结束时间（用于查找下一个字幕边界）
+        self._index_disjoint = False  # 字幕是否按顺序排列且互不重叠（游标快速路径的前提）
+        # 播放游标：连续播放时先检查当前字幕和下一条字幕，跳转后再回退到二分查找
+        self._cursor = -1  # 最近一条开始时间 <= 查询时间的字幕下标
+        self._cursor_valid = False  # 游标是否可用（加载或跳转后失效）
+        self.cursor_hits = 0  # 游标命中次数
+        self.cursor_misses = 0  # 游标未命中次数（走二分查找）
 
     # 加载字幕文件（支持SRT/TXT）
     def load_subtitle(self, subtitle_path):
@@ -17,55 +106,260 @@ class SubtitleHandler:
         self.current_subtitle_path = subtitle_path
         ext = os.path.splitext(subtitle_path)[1].lower()
 
+        # 最近加载过且文件未变化时直接使用内存中的结果
+        stamp = None
+        if self.memory_cache is not None:
+            stamp = self.memory_cache.file_stamp(subtitle_path)
+            cached = self.memory_cache.get("subtitle", subtitle_path, stamp)
+            if cached is not None:
+                self.subtitle_content, self.subtitle_timelines = cached
+                self.build_cue_index()
+                return True, "加载成功"
+
         if ext == ".srt":
-            self.subtitle_content, self.subtitle_timelines = self.parse_srt(subtitle_path)
+            self.subtitle_content, self.subtitle_timelines = self.load_srt(subtitle_path)
         else:  # TXT文件（按行读取，无时间轴）
             with open(subtitle_path, "r", encoding="utf-8", errors="ignore") as f:
                 self.subtitle_content = f.read()
             self.subtitle_timelines = []
 
+        if self.memory_cache is not None:
+            size = self.memory_cache.estimate_subtitle_size(self.subtitle_content, self.subtitle_timelines)
+            self.memory_cache.put("subtitle", subtitle_path, stamp,
+                                  (self.subtitle_content, self.subtitle_timelines), size)
+
+        self.build_cue_index()
         return True, "加载成功"
 
+    # 建立字幕索引：按开始时间排序（开始时间相同时保持文件顺序）
+    def build_cue_index(self):
+        self._indexed_timelines = self.subtitle_timelines
+        order = sorted(range(len(self.subtitle_timelines)), key=lambda i: self.subtitle_timelines[i][0])
+        self._index_order = order
+        self._index_starts = [self.subtitle_timelines[i][0] for i in order]
+        self._index_ends = [self.subtitle_timelines[i][1] for i in order]
+
+        self._build_segments()
+        self._index_sorted_ends = sorted(self._index_ends)
+
+        # 按文件顺序检查，满足时排序下标与文件下标一致
+        cues = self.subtitle_timelines
+        self._index_disjoint = (all(start_sec <= end_sec for start_sec, end_sec, _ in cues) and
+                                all(cues[i][1] <= cues[i + 1][0] for i in range(len(cues) - 1)))
+        self._cursor = -1
+        self._cursor_valid = False
+        self.cursor_hits = 0
+        self.cursor_misses = 0
+
+    # 按时间顺序扫描各区段，用最小堆维护覆盖当前区段的字幕（堆顶为文件中最靠前的一条）
+    # 开始/结束时间都是区段端点，结束时间早于区段的字幕以后也不会再覆盖，可以直接弹出
+    def _build_segments(self):
+        cues = self.subtitle_timelines
+        points = sorted({sec for start_sec, end_sec, _ in cues for sec in (start_sec, end_sec)})
+        point_cues = []
+        gap_cues = []
+        heap = []
+        j = 0
+        n = len(self._index_order)
+        for k, point in enumerate(points):
+            while j < n and self._index_starts[j] <= point:
+                i = self._index_order[j]
+                if self._index_ends[j] >= self._index_starts[j]:
+                    heapq.heappush(heap, (i, self._index_ends[j]))
+                j += 1
+            while heap and heap[0][1] < point:
+                heapq.heappop(heap)
+            point_cues.append(heap[0][0] if heap else -1)
+            if k + 1 < len(points):
+                while heap and heap[0][1] < points[k + 1]:
+                    heapq.heappop(heap)
+            else:
+                heap = []
+            gap_cues.append(heap[0][0] if heap else -1)
+        self._segment_points = points
+        self._point_cues = point_cues
+        self._gap_cues = gap_cues
+
+    # 使播放游标失效（快进/后退/跳转后调用，下一次查找走二分查找）
+    def reset_cue_cursor(self):
+        self._cursor_valid = False
+
+    # 获取游标命中统计
+    def get_cursor_stats(self):
+        total = self.cursor_hits + self.cursor_misses
+        return {
+            "hits": self.cursor_hits,
+            "misses": self.cursor_misses,
+            "hit_rate": self.cursor_hits / total if total else 0.0
+        }
+
+    # 加载SRT字幕（优先读取磁盘缓存，未命中时解析并写入缓存）
+    def load_srt(self, srt_path):
+        if self.subtitle_cache is None:
+            return self.parse_srt(srt_path)
+
+        stat = os.stat(srt_path)
+        timelines = self.subtitle_cache.get(srt_path, stat)
+        if timelines is not None:
+            return "\n\n".join(text for _, _, text in timelines), timelines
+
+        pure_text, timelines = self.parse_srt(srt_path)
+        self.subtitle_cache.put(srt_path, stat, timelines)
+        return pure_text, timelines
+
     # 解析SRT字幕（提取时间轴与文本）
     def parse_srt(self, srt_path):
-        with open(srt_path, "r", encoding="utf-8", errors="ignore") as f:
-            content = f.read()
+        timelines = list(self.iter_srt(srt_path))
+        pure_text = "\n\n".join(text for _, _, text in timelines)
+        return pure_text, timelines
+
+    # 逐行流式解析SRT字幕，每解析完一条字幕就产出 (start_sec, end_sec, text)
+    # utf-8-sig 去掉BOM，通用换行模式兼容CRLF；多行字幕用换行符拼接
+    @classmethod
+    def iter_srt(cls, srt_path):
+        with open(srt_path, "r", encoding="utf-8-sig", errors="ignore") as f:
+            start_sec = None
+            end_sec = None
+            text_lines = []
+            for raw_line in f:
+                line = raw_line.strip()
 
-        # 正则匹配SRT格式：序号 + 时间轴 + 文本
-        srt_pattern = r"\d+\n(\d{2}:\d{2}:\d{2},\d{3}) --> (\d{2}:\d{2}:\d{2},\d{3})\n([\s\S]*?)(?=\n\d+|$)"
-        matches = re.findall(srt_pattern, content, re.MULTILINE)
+                if "-->" in line:
+                    timing = cls.parse_timing_line(line)
+                    if timing is not None:
+                        if start_sec is not None:
+                            # 上一条字幕后缺少空行：去掉误收的序号行
+                            if text_lines and text_lines[-1].isdigit():
+                                text_lines.pop()
+                            yield start_sec, end_sec, "\n".join(text_lines)
+                        start_sec, end_sec = timing
+                        text_lines = []
+                        continue
 
-        timelines = []
-        pure_text = []
-        for match in matches:
-            start_time = match[0]
-            end_time = match[1]
-            text = match[2].strip()
+                if start_sec is None:  # 序号行或字幕之间的空行
+                    continue
 
-            # 时间轴转换为秒（00:00:00,000 → 秒）
-            start_sec = self.time_to_sec(start_time)
-            end_sec = self.time_to_sec(end_time)
-            timelines.append((start_sec, end_sec, text))
-            pure_text.append(text)
+                if not line:  # 空行表示当前字幕结束
+                    yield start_sec, end_sec, "\n".join(text_lines)
+                    start_sec = None
+                    text_lines = []
+                else:
+                    text_lines.append(line)
 
-        return "\n\n".join(pure_text), timelines
+            if start_sec is not None:
+                yield start_sec, end_sec, "\n".join(text_lines)
+
+    # 解析时间轴行（00:00:01,000 --> 00:00:02,500），格式不正确时返回 None
+    @classmethod
+    def parse_timing_line(cls, line):
+        start_str, _, end_str = line.partition("-->")
+        end_parts = end_str.split()
+        if not end_parts:
+            return None
+        try:
+            return cls.time_to_sec(start_str.strip()), cls.time_to_sec(end_parts[0])
+        except ValueError:
+            return None
 
     # 时间格式转换（00:00:00,000 → 秒）
+    # 小时位数不固定，分、秒、毫秒按固定偏移取整数，最后只做一次除法
     @staticmethod
     def time_to_sec(time_str):
-        time_str = time_str.replace(",", ".")  # 00:00:00.000
-        hours, minutes, seconds = map(float, time_str.split(":"))
-        return hours * 3600 + minutes * 60 + seconds
+        hours_end = time_str.index(":")
+        rest = time_str[hours_end + 1:]
+        if len(rest) != 9 or rest[2] != ":" or rest[5] not in ",.":
+            raise ValueError(f"时间格式错误：{time_str}")
+        milliseconds = (int(time_str[:hours_end]) * 3600000 + int(rest[0:2]) * 60000 +
+                        int(rest[3:5]) * 1000 + int(rest[6:9]))
+        return milliseconds / 1000
+
+    # 查找包含指定时间的字幕下标（未命中返回 -1）
+    # 多条字幕重叠时返回文件中最靠前的一条，与逐条扫描的结果一致
+    def find_cue_index(self, sec):
+        if self._indexed_timelines is not self.subtitle_timelines:
+            self.build_cue_index()
+
+        if self._cursor_valid and self._index_disjoint:
+            index = self._find_near_cursor(sec)
+            if index is not None:
+                self.cursor_hits += 1
+                return index
+
+        self.cursor_misses += 1
+        return self._search_cue_index(sec)
+
+    # 游标快速路径：只检查当前字幕、下一条字幕和两者之间的间隙，无法确定时返回 None
+    def _find_near_cursor(self, sec):
+        starts, ends = self._index_starts, self._index_ends
+        i = self._cursor
+        if i >= 0:
+            if sec < starts[i]:  # 向后跳转
+                return None
+            if sec == starts[i] and i > 0 and ends[i - 1] >= sec:  # 与上一条字幕首尾相接，应返回上一条
+                return None
+            if sec <= ends[i]:
+                return i
+
+        next_i = i + 1
+        if next_i < len(starts) and sec >= starts[next_i]:
+            if sec <= ends[next_i]:
+                self._cursor = next_i
+                return next_i
+            return None  # 跳过了不止一条字幕
+
+        # 落在当前字幕与下一条字幕之间的间隙
+        return -1
+
+    # 二分查找 sec 所在的区段，同时重新定位游标
+    def _search_cue_index(self, sec):
+        k = bisect_right(self._segment_points, sec) - 1
+        if k < 0:
+            found = -1
+        elif self._segment_points[k] == sec:
+            found = self._point_cues[k]
+        else:
+            found = self._gap_cues[k]
+
+        if self._index_disjoint:
+            # 开始时间 <= sec 的字幕都在 pos 之前
+            pos = bisect_right(self._index_starts, sec)
+            self._cursor = found if found >= 0 else pos - 1
+            self._cursor_valid = True
+        return found
+
+    # 下一个字幕边界：sec 之后第一个开始时间或结束时间（显示的字幕可能在此变化），没有时返回 None
+    # 开始时间当刻即进入字幕，结束时间之后才离开，因此结束时间等于 sec 时仍算作下一个边界
+    def next_cue_boundary(self, sec):
+        if self._indexed_timelines is not self.subtitle_timelines:
+            self.build_cue_index()
+
+        candidates = []
+        pos = bisect_right(self._index_starts, sec)
+        if pos < len(self._index_starts):
+            candidates.append(self._index_starts[pos])
+        pos = bisect_left(self._index_sorted_ends, sec)
+        if pos < len(self._index_sorted_ends):
+            candidates.append(self._index_sorted_ends[pos])
+        return min(candidates) if candidates else None
 
     # 匹配当前音频进度对应的字幕片段
     def match_current_subtitle(self, current_sec):
-        if not self.subtitle_timelines:
+        index = self.find_cue_index(current_sec)
+        if index < 0:
             return None
+        return self.subtitle_timelines[index]
 
-        for start_sec, end_sec, text in self.subtitle_timelines:
-            if start_sec <= current_sec <= end_sec:
-                return (start_sec, end_sec, text)
-        return None
+    # 查找与音频同名的字幕文件（优先SRT），找不到时返回空字符串
+    @staticmethod
+    def find_matching_subtitle(subtitle_folder, audio_name):
+        if not subtitle_folder:
+            return ""
+        audio_base = os.path.splitext(audio_name)[0]
+        for ext in (".srt", ".txt"):
+            subtitle_name = audio_base + ext
+            if os.path.exists(os.path.join(subtitle_folder, subtitle_name)):
+                return subtitle_name
+        return ""
 
     # 切换字幕隐藏/显示状态
     def toggle_hide(self, is_hide):
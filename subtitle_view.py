@@ -0,0 +1,83 @@
+import html
+import re
+from PyQt5.QtCore import Qt, QStringListModel, QSize
+from PyQt5.QtGui import QColor, QFont, QFontMetrics
+from PyQt5.QtWidgets import QStyledItemDelegate, QStyle
+
+
+_TAG_RE = re.compile(r"<[^>]*>")
+
+
+# 字幕列表模型：每条字幕一行，保存原始字幕文本和当前高亮的行
+# 基于 QStringListModel，行数、索引等排版时对每一行都会调用的接口都在 C++ 中完成
+class SubtitleListModel(QStringListModel):
+    HighlightRole = Qt.UserRole + 1
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.highlight_index = -1
+
+    # 替换字幕列表：[(start_sec, end_sec, text), ...]
+    def set_items(self, items):
+        self.highlight_index = -1
+        self.setStringList([text for _, _, text in items])
+
+    # 切换高亮行，只通知新旧两行发生变化
+    def set_highlight(self, index):
+        previous = self.highlight_index
+        self.highlight_index = index
+        for row in (previous, index):
+            if 0 <= row < self.rowCount():
+                model_index = self.index(row)
+                self.dataChanged.emit(model_index, model_index, [self.HighlightRole])
+
+    # 只有可见的行会被读取
+    def data(self, index, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole:
+            # 与文本框中的显示一致：去掉HTML标签，多行字幕合并为一行（自动换行）
+            text = super().data(index, role)
+            return html.unescape(_TAG_RE.sub("", text)).replace("\n", " ") if text else text
+        if role == self.HighlightRole:
+            return index.row() == self.highlight_index
+        return super().data(index, role)
+
+
+# 字幕行绘制：普通行黑色，高亮行使用高亮颜色、加大加粗
+# 所有行等高（按高亮样式的 LINES 行计算），列表视图不需要逐行测量文本即可排版和定位，
+# 切换高亮时行高也不变；超出的文字以省略号结尾
+class SubtitleDelegate(QStyledItemDelegate):
+    MARGIN = 8  # 行上下留白（与文本框中段落的上下边距一致）
+    LINES = 2  # 每行字幕最多显示的文字行数（字幕一般不超过两行）
+
+    def __init__(self, ui, parent=None):
+        super().__init__(parent)
+        self.ui = ui  # 读取当前字体大小和高亮颜色
+
+    def _font(self, highlighted):
+        font = QFont("Microsoft YaHei")
+        if highlighted:
+            font.setPixelSize(self.ui.current_font_size + 2)
+            font.setBold(True)
+        else:
+            font.setPixelSize(self.ui.current_font_size)
+        return font
+
+    def sizeHint(self, option, index):
+        metrics = QFontMetrics(self._font(True))
+        return QSize(option.rect.width(), metrics.lineSpacing() * self.LINES + 2 * self.MARGIN)
+
+    def paint(self, painter, option, index):
+        highlighted = index.data(SubtitleListModel.HighlightRole)
+        font = self._font(highlighted)
+        text_rect = option.rect.adjusted(self.MARGIN, self.MARGIN, -self.MARGIN, -self.MARGIN)
+        # 按可用宽度粗略省略，保证换行后不超过 LINES 行
+        text = QFontMetrics(font).elidedText(index.data(Qt.DisplayRole), Qt.ElideRight,
+                                             text_rect.width() * self.LINES - text_rect.width() // 4)
+        painter.save()
+        if option.state & QStyle.State_Selected:
+            painter.fillRect(option.rect, option.palette.highlight().color().lighter(180))
+        painter.setClipRect(option.rect)
+        painter.setFont(font)
+        painter.setPen(QColor(self.ui.current_highlight_color if highlighted else "black"))
+        painter.drawText(text_rect, Qt.TextWordWrap, text)
+        painter.restore()
@@ -0,0 +1,94 @@
+import numpy as np
+
+
+# WSOLA（波形相似叠加）变速不变调
+# 输出按固定合成步长（半帧）逐段生成；每一帧的分析位置在名义位置附近搜索，
+# 选取与上一帧自然延续最相似的位置，再用汉宁窗叠加，避免相位不连续造成的杂音
+class WsolaStretcher:
+    def __init__(self, channels, sample_rate):
+        self.channels = channels
+        self.frame_size = 1024 if sample_rate < 64000 else 2048  # 帧长约 20~25ms
+        self.hop = self.frame_size // 2  # 合成步长（50%重叠时汉宁窗叠加后幅度恒定）
+        self.tolerance = self.hop // 2  # 分析位置的搜索范围（±）
+        n = np.arange(self.frame_size)
+        self.window = (0.5 - 0.5 * np.cos(2 * np.pi * n / self.frame_size)).astype(np.float32)[:, None]
+        self.speed = 1.0
+        self.reset()
+
+    # 重置状态（开始播放或跳转后调用）
+    def reset(self):
+        self._buffer = np.zeros((0, self.channels), dtype=np.float32)
+        self._buffer_start = 0  # _buffer[0] 对应的输入帧号
+        self._input_end = None  # 输入结束时的帧号
+        self._position = 0.0  # 下一帧的名义分析位置（输入帧号）
+        self._prev_start = None  # 上一帧实际使用的分析位置
+        self._tail = np.zeros((self.hop, self.channels), dtype=np.float32)  # 上一帧后半段，等待与下一帧叠加
+        self.finished = False
+
+    # 下一段输出对应的输入位置（输入帧号）
+    @property
+    def position(self):
+        return self._position
+
+    # 生成一段输出（hop 帧），输入已结束时返回 None
+    # source.read(n) 返回最多 n 帧输入，返回不足 n 帧表示输入结束
+    def synthesize_hop(self, source):
+        frame_size, hop, tolerance = self.frame_size, self.hop, self.tolerance
+        nominal = int(round(self._position))
+        if self._input_end is None:
+            needed = nominal + tolerance + frame_size
+            if self._prev_start is not None:
+                needed = max(needed, self._prev_start + hop + frame_size)
+            self._fill(source, needed)
+        if self._input_end is not None and nominal >= self._input_end:
+            self.finished = True
+            return None
+
+        if self._prev_start is None or nominal == self._prev_start + hop:
+            # 第一帧，或正好是上一帧的自然延续（1.00x 时总是如此）
+            start = nominal
+        else:
+            natural = self._slice(self._prev_start + hop, hop).mean(axis=1)
+            low = max(nominal - tolerance, self._buffer_start)
+            high = nominal + tolerance
+            region = self._slice(low, high - low + hop).mean(axis=1)
+            start = low + int(np.argmax(np.correlate(region, natural, "valid")))
+
+        frame = self._slice(start, frame_size) * self.window
+        output = self._tail + frame[:hop]
+        self._tail = frame[hop:]
+        self._prev_start = start
+        self._position += hop * self.speed
+        self._trim(min(start + hop, int(self._position) - tolerance))
+        return output
+
+    # 读取输入直到缓冲区覆盖到 end（输入帧号）
+    def _fill(self, source, end):
+        buffer_end = self._buffer_start + len(self._buffer)
+        if buffer_end >= end:
+            return
+        count = max(end - buffer_end, 4096)
+        data = source.read(count)
+        if len(data) < count:
+            self._input_end = buffer_end + len(data)
+        if len(data):
+            self._buffer = np.concatenate((self._buffer, data))
+
+    # 取出 [start, start + length) 的输入，超出范围的部分补零
+    def _slice(self, start, length):
+        offset = start - self._buffer_start
+        if offset >= 0 and offset + length <= len(self._buffer):
+            return self._buffer[offset:offset + length]
+        result = np.zeros((length, self.channels), dtype=np.float32)
+        src_start = max(offset, 0)
+        src_end = min(offset + length, len(self._buffer))
+        if src_end > src_start:
+            result[src_start - offset:src_end - offset] = self._buffer[src_start:src_end]
+        return result
+
+    # 丢弃 keep_from 之前不再需要的输入
+    def _trim(self, keep_from):
+        drop = keep_from - self._buffer_start
+        if drop > 0:
+            self._buffer = self._buffer[drop:]
+            self._buffer_start += drop
@@ -7,12 +7,16 @@ import sys
 from PyQt5.QtWidgets import (QMainWindow, QApplication, QWidget, QVBoxLayout, QHBoxLayout,
                              QListWidget, QPushButton, QTextEdit, QLineEdit, QLabel, QFileDialog,
                              QSplitter, QTabWidget, QSpinBox, QComboBox, QMessageBox, QListWidgetItem,
-                             QSlider)
+                             QSlider, QListView, QStackedWidget, QAbstractItemView, QTableView, QHeaderView)
 from PyQt5.QtCore import Qt, pyqtSignal
-from PyQt5.QtGui import QColor, QTextCursor, QFont
+from PyQt5.QtGui import QColor, QTextCursor, QFont, QTextBlockFormat, QTextDocumentFragment
+from subtitle_view import SubtitleListModel, SubtitleDelegate
+from mark_view import MarkListModel
 
 
 class AudioSubtitleUI(QMainWindow):
+    FRAGMENT_CACHE_LIMIT = 100000  # 字幕片段缓存的最大条数
+    VIRTUAL_VIEW_THRESHOLD = 2000  # 字幕条数达到该值时改用只绘制可见行的列表视图
     # 定义信号：传递用户操作（选择文件夹、播放控制等）
     select_audio_folder_signal = pyqtSignal()
     select_subtitle_folder_signal = pyqtSignal()
@@ -26,7 +30,7 @@ class AudioSubtitleUI(QMainWindow):
     toggle_subtitle_signal = pyqtSignal()
     audio_double_click_signal = pyqtSignal(str)
     subtitle_double_click_signal = pyqtSignal(str)
-    mark_item_double_click_signal = pyqtSignal(str)
+    mark_item_double_click_signal = pyqtSignal(int)  # 传递标记ID
     font_size_changed_signal = pyqtSignal(int)
     highlight_color_changed_signal = pyqtSignal(str)
     playback_speed_changed_signal = pyqtSignal(float)
@@ -40,6 +44,12 @@ class AudioSubtitleUI(QMainWindow):
         self.is_subtitle_hidden = False  # 字幕隐藏状态
         self.current_font_size = 16  # 当前字体大小
         self.current_highlight_color = "red"  # 当前高亮颜色
+        self._rendered_subtitles = None  # 已渲染到文档中的字幕列表
+        self._subtitle_blocks = []  # 位置表：每条字幕对应的文本块 [QTextBlock, ...]，用于直接定位
+        self._highlight_index = -1  # 文档中当前高亮的字幕索引
+        self._virtual_view = False  # 当前字幕是否显示在列表视图中
+        # 已解析的字幕片段：(字幕文本, 是否高亮) -> QTextDocumentFragment，只在字体或颜色变化时清空
+        self._fragment_cache = {}
         self.init_ui()
 
     def init_ui(self):
@@ -99,11 +109,25 @@ class AudioSubtitleUI(QMainWindow):
         # 字幕显示区域（用于高亮显示当前句子）
         self.subtitle_display = QTextEdit()
         self.subtitle_display.setReadOnly(True)
+        self.subtitle_display.setUndoRedoEnabled(False)  # 高亮切换会修改文档，不需要撤销记录
         self.subtitle_display.setPlaceholderText("双击右侧字幕文件加载内容...")
         self.update_subtitle_font()
 
+        # 长字幕（整本书的有声书等）使用列表视图：只绘制可见的行，跳转到当前行不需要逐行移动
+        self.subtitle_model = SubtitleListModel(self)
+        self.subtitle_view = QListView()
+        self.subtitle_view.setModel(self.subtitle_model)
+        self.subtitle_view.setItemDelegate(SubtitleDelegate(self, self.subtitle_view))
+        self.subtitle_view.setUniformItemSizes(True)  # 等高行：排版和定位不需要测量每一行
+        self.subtitle_view.setVerticalScrollMode(QAbstractItemView.ScrollPerPixel)
+        self.subtitle_view.setEditTriggers(QAbstractItemView.NoEditTriggers)
+
+        self.subtitle_stack = QStackedWidget()
+        self.subtitle_stack.addWidget(self.subtitle_display)
+        self.subtitle_stack.addWidget(self.subtitle_view)
+
         subtitle_layout.addLayout(subtitle_control_layout)
-        subtitle_layout.addWidget(self.subtitle_display)
+        subtitle_layout.addWidget(self.subtitle_stack)
         mid_splitter.addWidget(self.subtitle_widget)
 
         # 中间：播放器控制区
@@ -146,6 +170,17 @@ class AudioSubtitleUI(QMainWindow):
         speed_layout.addWidget(self.speed_label)
         speed_layout.addWidget(self.speed_slider)
 
+        # 标记片段循环次数（0 为无限循环）
+        loop_layout = QHBoxLayout()
+        loop_layout.addWidget(QLabel("标记片段播放："))
+        self.loop_spin = QSpinBox()
+        self.loop_spin.setRange(0, 99)
+        self.loop_spin.setValue(1)
+        self.loop_spin.setSuffix(" 遍")
+        self.loop_spin.setSpecialValueText("无限循环")
+        loop_layout.addWidget(self.loop_spin)
+        loop_layout.addStretch()
+
         # 标记按钮（核心）
         self.mark_btn = QPushButton("标记当前片段")
         self.mark_btn.setMinimumHeight(50)
@@ -155,6 +190,7 @@ class AudioSubtitleUI(QMainWindow):
         player_layout.addWidget(self.progress_label)
         player_layout.addLayout(control_layout)
         player_layout.addLayout(speed_layout)
+        player_layout.addLayout(loop_layout)
         player_layout.addWidget(self.mark_btn)
         player_layout.addStretch()
 
@@ -170,7 +206,10 @@ class AudioSubtitleUI(QMainWindow):
         self.audio_folder_btn.clicked.connect(self.select_audio_folder_signal.emit)
         self.audio_list = QListWidget()
         # 修复：直接使用lambda表达式
-        self.audio_list.itemDoubleClicked.connect(lambda item: self.audio_double_click_signal.emit(item.text()))
+        # 列表显示文本包含音频信息，文件名保存在 UserRole 中
+        self.audio_list.itemDoubleClicked.connect(
+            lambda item: self.audio_double_click_signal.emit(item.data(Qt.UserRole) or item.text()))
+        self._audio_items = {}  # 文件名 -> 列表项
         self.audio_placeholder = QListWidgetItem("未加载音频文件...")
         self.audio_placeholder.setForeground(Qt.gray)  # 灰色提示文字
         self.audio_list.addItem(self.audio_placeholder)
@@ -216,12 +255,22 @@ class AudioSubtitleUI(QMainWindow):
 
         # 标记列表
         self.mark_label = QLabel("标记片段列表：")
-        self.mark_list = QListWidget()
-        # 修复：直接使用lambda表达式
-        self.mark_list.itemDoubleClicked.connect(lambda item: self.mark_item_double_click_signal.emit(item.text()))
-        self.mark_placeholder = QListWidgetItem("暂无标记，点击「标记当前片段」添加...")
-        self.mark_placeholder.setForeground(Qt.gray)  # 灰色提示文字
-        self.mark_list.addItem(self.mark_placeholder)
+        # 模型视图：添加标记时只插入新行，几十万条标记也只绘制可见的行
+        # 使用单列、隐藏表头的表格视图：行高固定，插入一行不需要重新排版所有行（列表视图插入时会重排全部行）
+        self.mark_model = MarkListModel(self)
+        self.mark_list = QTableView()
+        self.mark_list.setModel(self.mark_model)
+        self.mark_list.horizontalHeader().hide()
+        self.mark_list.horizontalHeader().setStretchLastSection(True)
+        self.mark_list.verticalHeader().hide()
+        self.mark_list.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.mark_list.verticalHeader().setDefaultSectionSize(self.mark_list.fontMetrics().height() + 6)
+        self.mark_list.setShowGrid(False)
+        self.mark_list.setWordWrap(False)
+        self.mark_list.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.mark_list.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.mark_list.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.mark_list.doubleClicked.connect(self.on_mark_item_double_clicked)
 
         bottom_layout.addLayout(mark_oper_layout)
         bottom_layout.addWidget(self.mark_label)
@@ -232,6 +281,8 @@ class AudioSubtitleUI(QMainWindow):
     def on_font_size_changed(self, size):
         self.current_font_size = size
         self.update_subtitle_font()
+        self._fragment_cache.clear()
+        self._rendered_subtitles = None  # 字体变化后需要重建字幕文档
         self.font_size_changed_signal.emit(size)
 
     # 高亮颜色改变处理
@@ -245,8 +296,16 @@ class AudioSubtitleUI(QMainWindow):
             "粉色": "pink"
         }
         self.current_highlight_color = color_map.get(color_name, "red")
+        self._fragment_cache.clear()
+        self._rendered_subtitles = None  # 颜色变化后需要重建字幕文档
         self.highlight_color_changed_signal.emit(self.current_highlight_color)
 
+    # 标记列表双击：发送该行的标记ID（提示行没有ID）
+    def on_mark_item_double_clicked(self, index):
+        mark_id = self.mark_model.mark_id(index)
+        if mark_id is not None:
+            self.mark_item_double_click_signal.emit(mark_id)
+
     # 倍速滑块改变处理
     def on_speed_slider_changed(self, value):
         speed = value / 100.0  # 转换为0.01-3.00的范围
@@ -266,10 +325,30 @@ class AudioSubtitleUI(QMainWindow):
     # 更新音频列表
     def update_audio_list(self, audio_files):
         self.audio_list.clear()
+        self._audio_items = {}
         if not audio_files:  # 为空时显示提示
             self.audio_list.addItem(self.audio_placeholder)
         else:  # 有内容时显示实际文件
-            self.audio_list.addItems(audio_files)
+            for audio_name in audio_files:
+                item = QListWidgetItem(audio_name)
+                item.setData(Qt.UserRole, audio_name)
+                self.audio_list.addItem(item)
+                self._audio_items[audio_name] = item
+
+    # 更新音频列表项的信息（时长、码率、采样率、同名字幕）
+    def update_audio_item_info(self, audio_name, info):
+        item = self._audio_items.get(audio_name)
+        if item is None:
+            return
+        details = [self.sec_to_time(info.get("duration", 0))]
+        if info.get("bitrate"):
+            details.append(f"{info['bitrate'] // 1000}kbps")
+        if info.get("sample_rate"):
+            details.append(f"{info['sample_rate'] / 1000:g}kHz")
+        if info.get("subtitle"):
+            details.append("有字幕")
+        item.setText(f"{audio_name}  [{' · '.join(details)}]")
+        item.setToolTip(f"字幕：{info['subtitle']}" if info.get("subtitle") else "未找到同名字幕")
 
     # 更新字幕列表
     def update_subtitle_list(self, subtitle_files):
@@ -280,35 +359,107 @@ class AudioSubtitleUI(QMainWindow):
             self.subtitle_list.addItems(subtitle_files)
 
     # 更新字幕显示（高亮当前句子）
+    # 文档只在字幕列表、字体或颜色变化时重建一次，之后每次只改动新旧两条字幕的格式
     def update_subtitle_display(self, subtitle_items, current_index, is_hidden=False):
-        self.subtitle_display.clear()
         if is_hidden or not subtitle_items:
+            self.clear_subtitle_display()
             return
 
-        cursor = self.subtitle_display.textCursor()
+        if subtitle_items is not self._rendered_subtitles:
+            self.render_subtitle_document(subtitle_items)
+
+        # 高亮句子没有变化时什么都不做
+        if current_index == self._highlight_index:
+            return
+
+        previous_index = self._highlight_index
+        self._highlight_index = current_index
+        if self._virtual_view:
+            self.subtitle_model.set_highlight(current_index)
+            if 0 <= current_index < len(subtitle_items):
+                self.subtitle_view.scrollTo(self.subtitle_model.index(current_index),
+                                            QAbstractItemView.EnsureVisible)
+            return
+        if 0 <= previous_index < len(self._subtitle_blocks):
+            self._set_subtitle_block(previous_index, subtitle_items[previous_index][2], False)
+        if 0 <= current_index < len(self._subtitle_blocks):
+            self._set_subtitle_block(current_index, subtitle_items[current_index][2], True)
+            self._scroll_to_subtitle(current_index)
+
+    # 清空字幕显示
+    def clear_subtitle_display(self):
+        if self._rendered_subtitles is None:
+            return
+        self.subtitle_display.clear()
+        self.subtitle_model.set_items([])
+        self.subtitle_stack.setCurrentWidget(self.subtitle_display)
+        self._rendered_subtitles = None
+        self._subtitle_blocks = []
+        self._highlight_index = -1
+        self._virtual_view = False
+
+    # 构建字幕文档（每条字幕一个文本块，全部以普通样式插入）
+    # 字幕条数很多时只交给列表视图，不构建文档
+    def render_subtitle_document(self, subtitle_items):
+        self.subtitle_display.clear()
+        self._subtitle_blocks = []
+        self._highlight_index = -1
+        self._rendered_subtitles = subtitle_items
+        self._virtual_view = len(subtitle_items) >= self.VIRTUAL_VIEW_THRESHOLD
+        if self._virtual_view:
+            self.subtitle_model.set_items(subtitle_items)
+            self.subtitle_stack.setCurrentWidget(self.subtitle_view)
+            return
+        self.subtitle_model.set_items([])
+        self.subtitle_stack.setCurrentWidget(self.subtitle_display)
+
+        block_format = QTextBlockFormat()
+        block_format.setTopMargin(8)
+        block_format.setBottomMargin(8)
+
+        cursor = QTextCursor(self.subtitle_display.document())
+        cursor.beginEditBlock()
         for i, (start_sec, end_sec, text) in enumerate(subtitle_items):
-            if i == current_index:
-                # 当前句子用高亮颜色显示
-                cursor.insertHtml(
-                    f'<p style="color: {self.current_highlight_color}; margin: 8px 0; font-size: {self.current_font_size + 2}px; font-weight: bold;">{text}</p>')
+            if i == 0:
+                cursor.setBlockFormat(block_format)
             else:
-                # 其他句子用黑色显示
-                cursor.insertHtml(
-                    f'<p style="color: black; margin: 8px 0; font-size: {self.current_font_size}px;">{text}</p>')
-
-        # 滚动到当前句子
-        self.subtitle_display.moveCursor(QTextCursor.Start)
-        if current_index >= 0:
-            for _ in range(current_index):
-                self.subtitle_display.moveCursor(QTextCursor.Down)
-
-            # 确保当前句子可见
-            cursor = self.subtitle_display.textCursor()
-            cursor.movePosition(QTextCursor.Start)
-            for _ in range(current_index):
-                cursor.movePosition(QTextCursor.Down)
-            self.subtitle_display.setTextCursor(cursor)
-            self.subtitle_display.ensureCursorVisible()
+                cursor.insertBlock(block_format)
+            cursor.insertFragment(self._subtitle_fragment(text, False))
+            self._subtitle_blocks.append(cursor.block())
+        cursor.endEditBlock()
+
+    # 替换某条字幕所在文本块的内容（切换普通/高亮样式）
+    def _set_subtitle_block(self, index, text, highlighted):
+        cursor = QTextCursor(self._subtitle_blocks[index])
+        cursor.movePosition(QTextCursor.EndOfBlock, QTextCursor.KeepAnchor)
+        cursor.insertFragment(self._subtitle_fragment(text, highlighted))
+
+    # 获取单条字幕的文档片段（每种文本和样式只解析一次HTML）
+    def _subtitle_fragment(self, text, highlighted):
+        key = (text, highlighted)
+        fragment = self._fragment_cache.get(key)
+        if fragment is None:
+            if len(self._fragment_cache) >= self.FRAGMENT_CACHE_LIMIT:
+                self._fragment_cache.clear()
+            fragment = QTextDocumentFragment.fromHtml(self._subtitle_html(text, highlighted))
+            self._fragment_cache[key] = fragment
+        return fragment
+
+    # 生成单条字幕的HTML片段
+    def _subtitle_html(self, text, highlighted):
+        if highlighted:
+            # 当前句子用高亮颜色显示
+            return (f'<span style="color: {self.current_highlight_color}; font-size: {self.current_font_size + 2}px; '
+                    f'font-weight: bold;">{text}</span>')
+        # 其他句子用黑色显示
+        return f'<span style="color: black; font-size: {self.current_font_size}px; font-weight: normal;">{text}</span>'
+
+    # 滚动到当前句子：从位置表取出对应的文本块直接定位（不再从开头逐行移动光标）
+    def _scroll_to_subtitle(self, current_index):
+        cursor = QTextCursor(self._subtitle_blocks[current_index])
+        self.subtitle_display.setTextCursor(cursor)
+        # 确保当前句子可见
+        self.subtitle_display.ensureCursorVisible()
 
     # 更新播放进度标签
     def update_progress(self, current_time, total_time):
@@ -318,13 +469,20 @@ class AudioSubtitleUI(QMainWindow):
     def update_play_btn_text(self, is_playing):
         self.play_pause_btn.setText("暂停" if is_playing else "播放")
 
-    # 更新标记列表
+    # 更新标记列表：marks 为 [(mark_id, 显示文本), ...]，为空时显示提示
     def update_mark_list(self, marks):
-        self.mark_list.clear()
-        if not marks:  # 为空时显示提示
-            self.mark_list.addItem(self.mark_placeholder)
-        else:  # 有内容时显示实际标记
-            self.mark_list.addItems(marks)
+        self.mark_model.set_marks(marks)
+
+    # 在标记列表末尾添加一条标记
+    def add_mark_item(self, mark_id, text):
+        self.mark_model.add_mark(mark_id, text)
+
+    # 标记日志导入导出中禁用相关按钮，status 显示在标记列表标题后
+    def set_mark_io_busy(self, busy, status=""):
+        self.export_log_btn.setEnabled(not busy)
+        self.import_log_btn.setEnabled(not busy)
+        self.clear_marks_btn.setEnabled(not busy)
+        self.mark_label.setText(f"标记片段列表：{status}" if status else "标记片段列表：")
 
     # 更新字幕按钮文本
     def update_subtitle_btn_text(self, is_hidden):